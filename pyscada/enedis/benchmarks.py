@@ -0,0 +1,295 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmarks of the Enedis handler stages.
+
+Run them with : python -m pyscada.enedis.benchmarks --output results.json
+The detailsV3 payloads are the responses recorded in a replay folder (--fixtures)
+or generated by pyscada.enedis.mockserver.
+"""
+from __future__ import unicode_literals
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+from array import array
+from datetime import date, timedelta
+from time import perf_counter
+
+import numpy as np
+import defusedxml.ElementTree as ET
+
+from pyscada.enedis.mockserver import details_response
+from pyscada.enedis.parsing import (
+    extract_points,
+    local_to_utc_timestamps,
+    text_to_float,
+)
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+# label: days of the window
+SIZES = {
+    "1d": 1,
+    "7d": 7,
+    "1m": 30,
+    "12m": 365,
+    "36m": 3 * 365,
+}
+FLEET_SIZES = [1, 10, 100, 1000, 5000]
+XML_PATH = ".//grandeur/points"
+
+
+def measure(function, repeat=5):
+    """
+    return the durations in seconds of repeat calls
+    """
+    durations = []
+    for i in range(repeat):
+        start = perf_counter()
+        function()
+        durations.append(perf_counter() - start)
+    return durations
+
+
+def result(stage, durations, points=None, **kwargs):
+    r = dict(
+        stage=stage,
+        repeat=len(durations),
+        min=min(durations),
+        median=statistics.median(durations),
+        **kwargs,
+    )
+    if points is not None:
+        r["points"] = points
+        r["points_per_second"] = points / r["median"] if r["median"] else None
+    return r
+
+
+def window_days(name):
+    """
+    return the days of the window of a response recorded as prm_from_to.xml,
+    None if the name has no window like the technical responses
+    """
+    try:
+        prm, t_from, t_to = name[: -len(".xml")].split("_")
+        return (date.fromisoformat(t_to) - date.fromisoformat(t_from)).days
+    except ValueError:
+        return None
+
+
+def load_recorded_payloads(fixtures):
+    """
+    return {size label: detailsV3 response} with the largest response recorded in
+    the fixtures folder for each size, the size of the window the closest to its own
+    """
+    files = {}
+    for root, dirs, names in os.walk(fixtures):
+        for name in names:
+            days = window_days(name) if name.endswith(".xml") else None
+            if days is None:
+                continue
+            label = min(SIZES, key=lambda label: abs(SIZES[label] - days))
+            files.setdefault(label, []).append(os.path.join(root, name))
+    payloads = {}
+    for label in SIZES:
+        if label in files:
+            with open(max(files[label], key=os.path.getsize), "rb") as f:
+                payloads[label] = f.read()
+    return payloads
+
+
+def load_payloads(sizes, fixtures=None):
+    """
+    return {size label: detailsV3 COURBE response}, recorded in the fixtures folder
+    if given and generated by the mockserver otherwise
+    """
+    if sizes is None:
+        sizes = list(SIZES)
+    if fixtures is not None:
+        payloads = load_recorded_payloads(fixtures)
+        if len(payloads):
+            missing = [label for label in sizes if label not in payloads]
+            if len(missing):
+                logger.warning(f"No recorded response of {', '.join(missing)}")
+            return {label: payloads[label] for label in sizes if label in payloads}
+        logger.warning(f"No recorded response in {fixtures}, using synthetic payloads")
+    start = date(2023, 1, 2)
+    return {
+        label: details_response(
+            "12345678901234", "COURBE", "PA", start, start + timedelta(days=SIZES[label])
+        )
+        for label in sizes
+    }
+
+
+def bench_set_client(repeat):
+    from pyscada.enedis.clients import clear_clients, get_client
+
+    results = []
+    for service in ("technical", "detailsV3"):
+
+        def cold():
+            clear_clients()
+            get_client(service, "cert.pem", "key.pem")
+
+        results.append(result("set_client_cold", measure(cold, repeat), service=service))
+        results.append(
+            result(
+                "set_client_cached",
+                measure(lambda: get_client(service, "cert.pem", "key.pem"), repeat),
+                service=service,
+            )
+        )
+    clear_clients()
+    return results
+
+
+def bench_payload(label, payload, repeat):
+    results = []
+    points = extract_points(payload, [XML_PATH])[XML_PATH]
+    n = len(points)
+    kwargs = dict(size=label, bytes=len(payload))
+
+    results.append(
+        result("xml_parse", measure(lambda: ET.fromstring(payload), repeat), n, **kwargs)
+    )
+
+    def findall():
+        root = ET.fromstring(payload)
+        for elem in root.findall(XML_PATH):
+            elem.find("d").text, elem.find("v").text
+
+    results.append(result("findall_extraction", measure(findall, repeat), n, **kwargs))
+    results.append(
+        result(
+            "streaming_extraction",
+            measure(lambda: extract_points(payload, [XML_PATH]), repeat),
+            n,
+            **kwargs,
+        )
+    )
+
+    dates = [d for d, v in points]
+    values = [v for d, v in points]
+    results.append(
+        result(
+            "timestamp_localization",
+            measure(lambda: local_to_utc_timestamps(dates), repeat),
+            n,
+            **kwargs,
+        )
+    )
+    results.append(
+        result("value_conversion", measure(lambda: text_to_float(values), repeat), n, **kwargs)
+    )
+
+    ingestion = bench_ingestion(dates, values, repeat)
+    if ingestion is not None:
+        results.append(result("update_values", ingestion, n, **kwargs))
+    return results
+
+
+def bench_ingestion(dates, values, repeat):
+    """
+    time Variable.update_values if Django and PyScada are configured, None otherwise
+    """
+    if os.getenv("DJANGO_SETTINGS_MODULE") is None:
+        return None
+    try:
+        import django
+
+        django.setup()
+        from pyscada.models import Variable
+    except Exception as e:
+        logger.warning(f"update_values not measured : {e}")
+        return None
+    timestamps, valid = local_to_utc_timestamps(dates)
+    values, values_valid = text_to_float(values)
+    valid &= values_valid
+    values = array("d", values[valid].tobytes())
+    timestamps = array("d", timestamps[valid].tobytes())
+
+    def ingest():
+        var = Variable(id=1, name="benchmark", value_class="FLOAT64")
+        var.update_values(values, timestamps)
+        var.create_recorded_data_element()
+
+    return measure(ingest, repeat)
+
+
+def bench_fleet(fleet_sizes, payload, repeat):
+    """
+    time the parse, extraction and conversion of one response for each PRM of the fleet
+    """
+    results = []
+
+    def read(prms):
+        for i in range(prms):
+            points = extract_points(payload, [XML_PATH])[XML_PATH]
+            timestamps, valid = local_to_utc_timestamps([d for d, v in points])
+            values, values_valid = text_to_float([v for d, v in points])
+
+    n = len(extract_points(payload, [XML_PATH])[XML_PATH])
+    for prms in fleet_sizes:
+        durations = measure(lambda: read(prms), max(1, repeat if prms <= 100 else 1))
+        results.append(result("fleet_read", durations, n * prms, prms=prms))
+    return results
+
+
+def run(sizes=None, fleet_sizes=None, fleet_size_label="1d", repeat=5, fixtures=None):
+    """
+    run the benchmarks and return the results as a dict
+    """
+    fleet_sizes = FLEET_SIZES if fleet_sizes is None else fleet_sizes
+    payloads = load_payloads(sizes, fixtures)
+    results = []
+    results += bench_set_client(repeat)
+    for label, payload in payloads.items():
+        results += bench_payload(label, payload, repeat)
+    fleet_payload = payloads.get(fleet_size_label, next(iter(payloads.values())))
+    results += bench_fleet(fleet_sizes, fleet_payload, repeat)
+    return {
+        "environment": {
+            "python": sys.version.split()[0],
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "processor": platform.processor(),
+            "cpu_count": os.cpu_count(),
+        },
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Enedis handler benchmarks")
+    parser.add_argument("--output", help="JSON file, printed if not given")
+    parser.add_argument(
+        "--sizes",
+        nargs="*",
+        choices=list(SIZES),
+        help="response sizes, all by default",
+    )
+    parser.add_argument("--fleet-sizes", nargs="*", type=int, default=FLEET_SIZES)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--fixtures", help="replay folder of recorded responses")
+    args = parser.parse_args()
+    results = run(
+        sizes=args.sizes,
+        fleet_sizes=args.fleet_sizes,
+        repeat=args.repeat,
+        fixtures=args.fixtures,
+    )
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from pyscada.enedis.utils import get_setting
+
+import hashlib
+import json
+import os
+import zlib
+from datetime import date
+from tempfile import NamedTemporaryFile
+from threading import Lock
+from time import time
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+# services whose responses depend on the requested window only
+CACHED_SERVICES = ("detailsV3",)
+# input fields identifying a response
+KEY_FIELDS = ("prm", "type", "courbe_type", "from", "to", "corrigee")
+
+_caches = {}
+_caches_lock = Lock()
+
+
+class ResponseCache(object):
+    """
+    zlib compressed responses stored in a folder, named by the hash of the request,
+    kept for a time depending on the age of the window and removed from the least recently used
+    when the folder exceeds max_size bytes
+    """
+
+    def __init__(self, directory, max_size=512 * 1024 * 1024, ttls=None):
+        self.directory = directory
+        self.max_size = max_size
+        # [[window age in days, seconds], ..., [None, seconds or None to keep it]]
+        self.ttls = ttls if ttls is not None else [[None, None]]
+        self._size = None
+        self._lock = Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, service, input_dict):
+        fields = [service] + [str(input_dict.get(field, "")) for field in KEY_FIELDS]
+        return hashlib.sha256(json.dumps(fields).encode()).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], f"{key}.xml.z")
+
+    def ttl(self, input_dict):
+        """
+        return the seconds a response is kept, None to keep it until evicted
+        """
+        try:
+            age = (date.today() - date.fromisoformat(str(input_dict["to"]))).days
+        except (KeyError, ValueError):
+            age = 0
+        for max_age, ttl in self.ttls:
+            if max_age is None or age < max_age:
+                return ttl
+        return 0
+
+    def get(self, service, input_dict):
+        """
+        return the response stored or None
+        """
+        path = self._path(self.key(service, input_dict))
+        try:
+            stored = os.stat(path).st_mtime
+            ttl = self.ttl(input_dict)
+            if ttl is not None and time() - stored > ttl:
+                self._remove(path)
+                return None
+            with open(path, "rb") as f:
+                response = zlib.decompress(f.read())
+            # keep the access time to evict the least recently used
+            os.utime(path, (time(), stored))
+            return response
+        except FileNotFoundError:
+            return None
+        except (OSError, zlib.error) as e:
+            logger.warning(f"Cannot read the cached response {path} : {e}")
+            self._remove(path)
+            return None
+
+    def put(self, service, input_dict, response):
+        if not isinstance(response, (bytes, bytearray)) or self.ttl(input_dict) == 0:
+            return False
+        path = self._path(self.key(service, input_dict))
+        data = zlib.compress(response)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with NamedTemporaryFile(
+                dir=os.path.dirname(path), suffix=".tmp", delete=False
+            ) as f:
+                f.write(data)
+            os.replace(f.name, path)
+        except OSError as e:
+            logger.warning(f"Cannot cache the response in {path} : {e}")
+            return False
+        with self._lock:
+            if self._size is not None:
+                self._size += len(data)
+            size = self._size
+        if size is None or size > self.max_size:
+            self.evict()
+        return True
+
+    def _files(self):
+        files = []
+        for root, dirs, names in os.walk(self.directory):
+            for name in names:
+                if name.endswith(".xml.z"):
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    files.append((stat.st_atime, stat.st_size, path))
+        return files
+
+    def evict(self):
+        """
+        remove the least recently used responses down to 90 % of the max size
+        """
+        files = self._files()
+        size = sum(f[1] for f in files)
+        if size > self.max_size:
+            for atime, file_size, path in sorted(files):
+                if size <= self.max_size * 0.9:
+                    break
+                self._remove(path)
+                size -= file_size
+        with self._lock:
+            self._size = size
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def get_response_cache():
+    """
+    return the cache of the response_cache_dir setting or None if it is not set
+    """
+    directory = get_setting("response_cache_dir")
+    if directory is None:
+        return None
+    with _caches_lock:
+        if directory not in _caches:
+            _caches[directory] = ResponseCache(
+                directory,
+                max_size=get_setting("response_cache_max_size"),
+                ttls=get_setting("response_cache_ttls"),
+            )
+        return _caches[directory]
@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from pyscada.enedis.transport import PooledHttpsTransport, close_sessions
+from pyscada.enedis.utils import get_setting
+
+import os
+from collections import OrderedDict
+from threading import RLock, local
+from urllib.parse import urlsplit
+
+import lowatt_enedis
+import lowatt_enedis.services
+from suds.client import Client, ServiceSelector
+from suds.options import Options
+from suds.properties import Unskin
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+# per process SOAP clients, ordered from the least to the most recently used
+_clients = OrderedDict()
+_clients_lock = RLock()
+# clones of the clients used by each thread : a suds client keeps the state
+# of the request sent (SOAP header, messages) and cannot be shared by threads
+_thread_clients = local()
+
+
+def _files_signature(*file_paths):
+    """
+    return the modification time and size of the files to detect a change
+    """
+    signature = []
+    for file_path in file_paths:
+        try:
+            stat = os.stat(file_path)
+            signature.append((stat.st_mtime_ns, stat.st_size))
+        except (OSError, TypeError):
+            signature.append(None)
+    return tuple(signature)
+
+
+def _create_client(
+    service, certificate_file, key_file, homologation, proxy_url, token
+):
+    client = lowatt_enedis.get_client(
+        lowatt_enedis.COMMAND_SERVICE[service][0],
+        certificate_file,
+        key_file,
+        homologation,
+    )
+
+    # return as XML
+    client.options.retxml = True
+
+    # keep the connections of the certificate and key open between the requests
+    client.set_options(transport=PooledHttpsTransport(certificate_file, key_file))
+
+    # replace enedis url by the proxy url and token
+    for method in lowatt_enedis.iter_methods(client):
+        if proxy_url.startswith(("http://", "https://")):
+            # local or test server
+            path = urlsplit(method.location.decode()).path
+            method.location = f"{proxy_url.rstrip('/')}{path}".encode()
+        elif homologation:
+            method.location = method.location.replace(
+                b"sge-homologation-b2b.enedis.fr",
+                f"{proxy_url}/{token}_homologation".encode(),
+            )
+    return client
+
+
+def _clone_client(client):
+    """
+    return a client sharing the parsed WSDL of the client with its own options
+    and transport, like Client.clone which cannot deep copy the options
+    """
+    clone = Client.__new__(Client)
+    clone.options = Options()
+    options = dict(Unskin(client.options).defined)
+    transport = options.pop("transport")
+    options["plugins"] = list(options["plugins"])
+    Unskin(clone.options).update(options)
+    clone.set_options(
+        transport=PooledHttpsTransport(transport.certificate_file, transport.key_file)
+    )
+    Unskin(clone.options.transport.options).update(Unskin(transport.options).defined)
+    clone.wsdl = client.wsdl
+    clone.factory = client.factory
+    clone.service = ServiceSelector(clone, client.wsdl.services)
+    clone.sd = client.sd
+    clone.messages = dict(tx=None, rx=None)
+    return clone
+
+
+def _thread_client(key, client):
+    """
+    return the clone of the client used by the current thread
+    """
+    clones = getattr(_thread_clients, "clients", None)
+    if clones is None:
+        clones = _thread_clients.clients = OrderedDict()
+    if key not in clones or clones[key][0] is not client:
+        clones[key] = (client, _clone_client(client))
+    clones.move_to_end(key)
+    while len(clones) > max(1, int(get_setting("client_cache_size"))):
+        clones.popitem(last=False)
+    return clones[key][1]
+
+
+def get_client(
+    service,
+    certificate_file,
+    key_file,
+    homologation=False,
+    proxy_url="sge-b2b.enedis.fr",
+    token="",
+    login=None,
+):
+    """
+    return a SOAP client for the command service, reusing the one already built
+    by this process for the same service, certificate, key, homologation, proxy and login.
+    The login is part of the key as the SOAP header set for each request carries it.
+    A cached client is rebuilt when the certificate or key file changed.
+    Each thread gets its own clone of the client.
+    """
+    key = (service, certificate_file, key_file, homologation, proxy_url, token, login)
+    signature = _files_signature(certificate_file, key_file)
+    with _clients_lock:
+        if key in _clients:
+            client_signature, client = _clients[key]
+            if client_signature == signature:
+                _clients.move_to_end(key)
+                return _thread_client(key, client)
+            logger.info(f"Certificate or key changed, rebuild the {service} client")
+            del _clients[key]
+            close_sessions(certificate_file, key_file)
+
+    client = _create_client(
+        service, certificate_file, key_file, homologation, proxy_url, token
+    )
+
+    with _clients_lock:
+        _clients[key] = (signature, client)
+        _clients.move_to_end(key)
+        while len(_clients) > max(1, int(get_setting("client_cache_size"))):
+            _clients.popitem(last=False)
+    return _thread_client(key, client)
+
+
+def clear_clients():
+    """
+    remove all the SOAP clients of this process
+    """
+    with _clients_lock:
+        _clients.clear()
+    close_sessions()
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def merge_ranges(ranges):
+    """
+    return the sorted union of the [start, end) ranges
+    """
+    merged = []
+    for start, end in sorted(r for r in ranges if r[0] < r[1]):
+        if len(merged) and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(end, merged[-1][1]))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def missing_ranges(covered, start, end):
+    """
+    return the [start, end) ranges not covered
+    """
+    missing = []
+    for c_start, c_end in merge_ranges(covered):
+        if c_end <= start:
+            continue
+        if c_start >= end:
+            break
+        if c_start > start:
+            missing.append((start, c_start))
+        start = max(start, c_end)
+    if start < end:
+        missing.append((start, end))
+    return missing
+
+
+def overlaps(ranges, start, end):
+    """
+    return True if one of the ranges intersects [start, end)
+    """
+    return any(r_start < end and start < r_end for r_start, r_end in ranges)
+
+
+def split_ranges(ranges, length=None):
+    """
+    split the ranges in [start, end) windows of length at most
+    """
+    windows = []
+    for start, end in ranges:
+        while start < end:
+            t_to = end if length is None else min(end, start + length)
+            windows.append((start, t_to))
+            start = t_to
+    return windows
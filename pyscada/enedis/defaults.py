@@ -0,0 +1,394 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import hashlib
+import json
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+# increase to seed the defaults again when the seeding itself changes
+DEFAULTS_VERSION = 1
+
+DEVICE_HANDLER = {
+    "name": "EnedisHandler",
+    "handler_class": "pyscada.enedis.devices.enedis",
+}
+
+# {unit: (description, udunit)}
+UNITS = {
+    "": ("", ""),
+    "kWh": ("kilowatthour", "kilowatthour"),
+    "Wh": ("watthour", "watthour"),
+    "W": ("watt", "watt"),
+    "kVA": ("kilovoltampere", "kilovoltampere"),
+}
+
+# list of [label, command_service_type, xml_path, unit], the last field of a command service
+# and xml path gives the label and unit of the SGETiersField
+SGE_TIERS_FIELDS = [
+    # donneesGenerales
+    [
+        "Code postal",
+        "technical",
+        ".//donneesGenerales/adresseInstallation/codePostal",
+        "",
+    ],
+    [
+        "Escalier / Etage / Appartement",
+        "technical",
+        ".//donneesGenerales/adresseInstallation/escalierEtEtageEtAppartement",
+        "",
+    ],
+    [
+        "Batiment",
+        "technical",
+        ".//donneesGenerales/adresseInstallation/batiment",
+        "",
+    ],
+    [
+        "Numéro / Nom Voie",
+        "technical",
+        ".//donneesGenerales/adresseInstallation/numeroEtNomVoie",
+        "",
+    ],
+    [
+        "Lieu dit",
+        "technical",
+        ".//donneesGenerales/adresseInstallation/LieuDit",
+        "",
+    ],
+    [
+        "Commune",
+        "technical",
+        ".//donneesGenerales/adresseInstallation/commune/libelle",
+        "",
+    ],
+    [
+        "Etat contractuel",
+        "technical",
+        ".//donneesGenerales/etatContractuel/libelle",
+        "",
+    ],
+    [
+        "Date derniere modification formule tarifaire",
+        "technical",
+        ".//donneesGenerales/dateDerniereModificationFormuleTarifaireAcheminement",
+        "",
+    ],
+    [
+        "Date derniere augementation puissance souscrite",
+        "technical",
+        ".//donneesGenerales/dateDerniereAugmentationPuissanceSouscrite",
+        "",
+    ],
+    [
+        "Segment",
+        "technical",
+        ".//donneesGenerales/segment/libelle",
+        "",
+    ],
+    [
+        "Niveau ouverture services",
+        "technical",
+        ".//donneesGenerales/niveauOuvertureServices",
+        "",
+    ],
+    # situationAlimentation
+    [
+        "Domaine tension",
+        "technical",
+        ".//situationAlimentation/alimentationPrincipale/domaineTension/libelle",
+        "",
+    ],
+    [
+        "Tension livraison",
+        "technical",
+        ".//situationAlimentation/alimentationPrincipale/tensionLivraison/libelle",
+        "",
+    ],
+    [
+        "Puissance de raccordement",
+        "technical",
+        ".//situationAlimentation/alimentationPrincipale/puissanceRaccordementSoutirage",
+        "kVA",
+    ],
+    [
+        "Mode après compteur",
+        "technical",
+        ".//situationAlimentation/alimentationPrincipale/tensionLivraison/libelle",
+        "",
+    ],
+    # situation comptage
+    [
+        "Mode relevé",
+        "technical",
+        ".//situationComptage/modereleve/libelle",
+        "",
+    ],
+    [
+        "Media relevé",
+        "technical",
+        ".//situationComptage/mediareleve/libelle",
+        "",
+    ],
+    [
+        "futures plages heures creuses",
+        "technical",
+        ".//situationComptage/futuresPlagesHeuresCreuses/libelle",
+        "",
+    ],
+    [
+        "Type comptage",
+        "technical",
+        ".//situationComptage/dispositifComptage/typeComptage/libelle",
+        "",
+    ],
+    [
+        "Localisation compteur",
+        "technical",
+        ".//situationComptage/dispositifComptage/compteurs/compteur/localisation/libelle",
+        "",
+    ],
+    [
+        "Matricule compteur",
+        "technical",
+        ".//situationComptage/dispositifComptage/compteurs/compteur/matricule",
+        "",
+    ],
+    [
+        "TIC activée compteur",
+        "technical",
+        ".//situationComptage/dispositifComptage/compteurs/compteur/ticActivee",
+        "",
+    ],
+    [
+        "TIC standard compteur",
+        "technical",
+        ".//situationComptage/dispositifComptage/compteurs/compteur/ticStandard",
+        "",
+    ],
+    [
+        "TIC activable compteur",
+        "technical",
+        ".//situationComptage/dispositifComptage/compteurs/compteur/ticActivable",
+        "",
+    ],
+    [
+        "Plage heures creuses compteur",
+        "technical",
+        ".//situationComptage/dispositifComptage/compteurs/compteur/plagesHeuresCreuses",
+        "",
+    ],
+    [
+        "Numéro téléphone téléaccès compteur",
+        "technical",
+        ".//situationComptage/dispositifComptage/compteurs/compteur/parametresTeleAcces/numeroTelephone",
+        "",
+    ],
+    [
+        "Voie aiguillage téléaccès compteur",
+        "technical",
+        ".//situationComptage/dispositifComptage/compteurs/compteur/parametresTeleAcces/numeroVoieAiguillage",
+        "",
+    ],
+    [
+        "Etat ligne téléaccès compteur",
+        "technical",
+        ".//situationComptage/dispositifComptage/compteurs/compteur/parametresTeleAcces/etatLigneTelephonique",
+        "",
+    ],
+    [
+        "Clé téléaccès compteur",
+        "technical",
+        ".//situationComptage/dispositifComptage/compteurs/compteur/parametresTeleAcces/cle",
+        "",
+    ],
+    [
+        "Disjoncteur",
+        "technical",
+        ".//situationComptage/dispositifComptage/disjoncteur/calibre/libelle",
+        "",
+    ],
+    [
+        "Plage heures creuses",
+        "technical",
+        ".//situationComptage/dispositifComptage/relais/plageHeuresCreuses",
+        "",
+    ],
+    [
+        "Calibre transformateur",
+        "technical",
+        ".//situationComptage/dispositifComptage/transformateurCourant/calibre/libelle",
+        "",
+    ],
+    [
+        "Couplage transformateur",
+        "technical",
+        ".//situationComptage/dispositifComptage/transformateurCourant/couplage/libelle",
+        "",
+    ],
+    [
+        "Classe Precision transformateur",
+        "technical",
+        ".//situationComptage/dispositifComptage/transformateurCourant/classePrecision/libelle",
+        "",
+    ],
+    [
+        "Position transformateur",
+        "technical",
+        ".//situationComptage/dispositifComptage/transformateurCourant/position/libelle",
+        "",
+    ],
+    [
+        "Calibre Tension transformateur",
+        "technical",
+        ".//situationComptage/dispositifComptage/transformateurCourant/calibre/libelle",
+        "",
+    ],
+    # situation contractuelle
+    [
+        "Calendrier Frn",
+        "technical",
+        ".//situationContractuelle/structureTarifaire/calendrierFrn/libelle",
+        "",
+    ],
+    # ["Formule tarifaire", "technical", ".//situationContractuelle/structureTarifaire/formuleTarifaireAcheminement/libelle", ""],
+    [
+        "Formule tarifaire",
+        "technical",
+        ".//situationContractuelle/structureTarifaire/puissanceSouscriteMax/valeur",
+        "kVA",
+    ],
+    # time series
+    [
+        "Courbes puissances",
+        "detailsV3-COURBE-PA",
+        ".//grandeur/points",
+        "W",
+    ],  #    default_inputs["type"]='COURBE',default_inputs["courbe_type"]='PA'  / date:  .//grandeur/points/d
+    [
+        "Courbes énergie active",
+        "detailsV3-ENERGIE-EA",
+        ".//grandeur/points",
+        "Wh",
+    ],  #    default_inputs["type"]='ENERGIE',default_inputs["courbe_type"]='EA'  / date:  .//cadranTotalisateur/valeur/d
+    [
+        "Courbes énergie réactive",
+        "detailsV3-ENERGIE-ER",
+        ".//grandeur/points",
+        "Wh",
+    ],  #    default_inputs["type"]='ENERGIE',default_inputs["courbe_type"]='ER'  / date:  .//cadranTotalisateur/valeur/d
+    [
+        "Courbes index HC",
+        "detailsV3-INDEX-HC",
+        ".//calendrier/classeTemporelle/[idClasseTemporelle='HC']/valeur",
+        "Wh",
+    ],  #    default_inputs["type"]='ENERGIE',default_inputs["courbe_type"]='ER'  / date:  .//cadranTotalisateur/valeur/d
+    [
+        "Courbes index HP",
+        "detailsV3-INDEX-HP",
+        ".//calendrier/classeTemporelle/[idClasseTemporelle='HP']/valeur",
+        "Wh",
+    ],  #    default_inputs["type"]='ENERGIE',default_inputs["courbe_type"]='ER'  / date:  .//cadranTotalisateur/valeur/d
+]
+
+
+def fingerprint():
+    """
+    return the hash of the default rows, stored once they are seeded
+    """
+    defaults = [DEFAULTS_VERSION, DEVICE_HANDLER, UNITS, SGE_TIERS_FIELDS]
+    return hashlib.sha256(
+        json.dumps(defaults, sort_keys=True, ensure_ascii=False).encode()
+    ).hexdigest()
+
+
+def seed_defaults(force=False):
+    """
+    create the device handler, units and SGETiersField rows, and update the fields changed.
+    Nothing is written when the fingerprint of the defaults already seeded is the same,
+    return True if the rows were seeded
+    """
+    from django.db import transaction
+    from pyscada.models import DeviceHandler, Unit
+    from pyscada.enedis.models import SGETiersDefaults, SGETiersField
+
+    current = fingerprint()
+    if (
+        not force
+        and SGETiersDefaults.objects.filter(
+            name="default", fingerprint=current
+        ).exists()
+    ):
+        return False
+
+    with transaction.atomic():
+        handler, created = DeviceHandler.objects.get_or_create(
+            name=DEVICE_HANDLER["name"],
+            defaults={"handler_class": DEVICE_HANDLER["handler_class"]},
+        )
+        if created:
+            logger.info("Enedis Handler created.")
+
+        units = {u.unit: u for u in Unit.objects.filter(unit__in=UNITS.keys())}
+        Unit.objects.bulk_create(
+            [
+                Unit(unit=unit, description=description, udunit=udunit)
+                for unit, (description, udunit) in UNITS.items()
+                if unit not in units
+            ]
+        )
+        if len(units) < len(UNITS):
+            units = {u.unit: u for u in Unit.objects.filter(unit__in=UNITS.keys())}
+
+        # {(command_service_type, xml_path): (label, unit)}
+        defaults = {
+            (command_service_type, xml_path): (label, units[unit])
+            for label, command_service_type, xml_path, unit in SGE_TIERS_FIELDS
+        }
+        existing = {}
+        duplicates = []
+        for field in SGETiersField.objects.filter(
+            command_service_type__in={key[0] for key in defaults}
+        ).order_by("pk"):
+            key = (field.command_service_type, field.xml_path)
+            if key not in defaults:
+                continue
+            if key in existing:
+                duplicates.append(field.pk)
+            else:
+                existing[key] = field
+        if len(duplicates):
+            logger.warning(f"Remove {len(duplicates)} duplicated SGETiersField")
+            SGETiersField.objects.filter(pk__in=duplicates).delete()
+
+        to_create = []
+        to_update = []
+        for (command_service_type, xml_path), (label, unit) in defaults.items():
+            field = existing.get((command_service_type, xml_path))
+            if field is None:
+                to_create.append(
+                    SGETiersField(
+                        label=label,
+                        command_service_type=command_service_type,
+                        xml_path=xml_path,
+                        unit=unit,
+                    )
+                )
+            elif field.label != label or field.unit_id != unit.pk:
+                field.label = label
+                field.unit = unit
+                to_update.append(field)
+        SGETiersField.objects.bulk_create(to_create)
+        SGETiersField.objects.bulk_update(to_update, ["label", "unit"])
+        if len(to_create) or len(to_update):
+            logger.info(
+                f"SGETiersField : {len(to_create)} created, {len(to_update)} updated"
+            )
+
+        SGETiersDefaults.objects.update_or_create(
+            name="default", defaults={"fingerprint": current}
+        )
+    return True
@@ -6,13 +6,39 @@ from datetime import date, datetime, timedelta
 from dateutil.relativedelta import relativedelta
 import requests
 import json
-from time import sleep, time
-from pytz import timezone, utc
-from pytz.exceptions import AmbiguousTimeError
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from threading import Event, Lock
+from time import perf_counter, time
 
 import lowatt_enedis
 import lowatt_enedis.services
-import defusedxml.ElementTree as ET
+from pyscada.enedis.cache import CACHED_SERVICES, get_response_cache
+from pyscada.enedis.clients import get_client
+from pyscada.enedis.metrics import metrics
+from pyscada.enedis.coverage import (
+    merge_ranges,
+    missing_ranges,
+    overlaps,
+    split_ranges,
+)
+from pyscada.enedis.ratelimit import get_rate_limiter
+from pyscada.enedis.replay import RECORD, REPLAY, get_fixtures
+from pyscada.enedis.parsing import (
+    extract_points,
+    local_to_utc_timestamps,
+    text_to_float,
+)
+from pyscada.enedis.schedule import next_poll
+from pyscada.enedis.retry import (
+    RetryScheduler,
+    classify_error,
+    get_error_code,
+    FUNCTIONAL,
+    QUOTA,
+    TECHNICAL,
+)
+from pyscada.enedis.utils import get_setting
 from xml.sax._exceptions import SAXParseException
 
 import logging
@@ -22,7 +48,15 @@ logger = logging.getLogger(__name__)
 if os.getenv("DJANGO_SETTINGS_MODULE") is not None:
     try:
         from . import GenericDevice
-        from pyscada.models import VariableProperty, Variable
+        from pyscada.models import VariableProperty, Variable, DeviceReadTask
+        from pyscada.enedis.models import (
+            SGETiersCheckpoint,
+            SGETiersCoverage,
+            SGETiersVariable,
+        )
+        from pyscada.enedis.ingestion import bulk_write
+        from django.db import transaction
+        from django.utils import timezone
     except:
         logger.info("Run this file from the parent directory")
         print("Run this file from the parent directory")
@@ -135,38 +169,31 @@ class SGETiers(object):
         self.homologation = homologation
         self.timeout = timeout
         self.command_service = None
+        self.cache = get_response_cache()
+        self.replay_mode, self.fixtures = get_fixtures()
 
     def set_client(self, command_service="technical"):
         self.command_service = command_service
         self.c = command_service.split("-")[0]
-        self.client = lowatt_enedis.get_client(
-            lowatt_enedis.COMMAND_SERVICE[self.c][0],
+        # build the client now, the threads sending the requests use their own clone
+        self.client
+        return True
+
+    @property
+    def client(self):
+        """
+        SOAP client of the command service for the current thread
+        """
+        return get_client(
+            self.c,
             self.certificate_file,
             self.key_file,
-            self.homologation,
+            homologation=self.homologation,
+            proxy_url=self.proxy_url,
+            token=self.token,
+            login=self.login,
         )
 
-        # return as XML
-        self.client.options.retxml = True
-
-        # replace enedis url by the proxy url and token
-        for method in lowatt_enedis.iter_methods(self.client):
-            if self.homologation:
-                token = f"{self.token}_homologation"
-                method.location = method.location.replace(
-                    b"sge-homologation-b2b.enedis.fr",
-                    f"{self.proxy_url}/{token}".encode(),
-                )
-            else:
-                token = self.token
-                # print(method.location.decode("utf-8"))
-                # method.location = method.location.replace(
-                #    b"sge-b2b.enedis.fr",
-                #    f"{self.proxy_url}/{token}".encode("utf-8"),
-                # )
-                # print(method.location)
-        return True
-
     def send_request(self, input_dict):
         result = None
         try:
@@ -174,7 +201,30 @@ class SGETiers(object):
                 if "login" not in input_dict:
                     input_dict["login"] = self.login
 
+                # offline : the recorded responses are used without sending the request
+                if self.replay_mode == REPLAY:
+                    return self.fixtures.replay(self.c, input_dict)
+
+                # the closed windows are served by the cache without using the quota
+                cached = self.c in CACHED_SERVICES and self.cache is not None
+                if cached:
+                    r = self.cache.get(self.c, input_dict)
+                    if r is not None:
+                        metrics.inc("cache_hits_total", service=self.c)
+                        return r
+
+                # wait for the rate limit of the contract or login
+                limiter = get_rate_limiter(self.contract or input_dict["login"])
+                if not limiter.acquire(timeout=self.timeout):
+                    raise TimeoutError(
+                        f"no request available for {limiter.key} in {self.timeout} seconds"
+                    )
+
                 r = lowatt_enedis.COMMAND_SERVICE[self.c][2](self.client, input_dict)
+                if cached:
+                    self.cache.put(self.c, input_dict, r)
+                if self.replay_mode == RECORD:
+                    self.fixtures.record(self.c, input_dict, r)
                 return r
             else:
                 result = f"{self.c} command service does not exist."
@@ -194,6 +244,19 @@ class Handler(GenericDevice):
         self.variables_dict = {}
         self.inst = None
         self.inputs = {}
+        # failed requests to retry in a later read
+        self.retries = RetryScheduler(
+            max_attempts=get_setting("retry_max_attempts"),
+            base_delay=get_setting("retry_base_delay"),
+            max_delay=get_setting("retry_max_delay"),
+            quota_delay=get_setting("retry_quota_delay"),
+        )
+        # {sgetiers_variable_id: [(from, to), ...]} read, saved with the values
+        self.coverage = {}
+        # {command_service: datetime} next read of the services read
+        self.next_polls = {}
+        # (read time, technical data) requested before the read
+        self._technical = None
 
     def connect(self):
         if hasattr(self._device, "sgetiersdevice"):
@@ -201,6 +264,7 @@ class Handler(GenericDevice):
                 login=self._device.sgetiersdevice.login,
                 fullchain_certificate_file=self._device.sgetiersdevice.certificat,
                 private_key_file=self._device.sgetiersdevice.private_key,
+                proxy_url=get_setting("proxy_url"),
                 homologation=False,
             )
             return True
@@ -233,6 +297,17 @@ class Handler(GenericDevice):
                 self.variables_dict[var].sgetiersvariable.command_service_type
             ].append(var)
 
+        # read only the services which can have new data
+        schedule = self._get_schedule()
+        for command_service in list(self.command_service_type):
+            if not self._is_due(command_service, schedule):
+                logger.debug(
+                    f"{command_service} not read for {self._device} before {schedule.get(command_service)}"
+                )
+                del self.command_service_type[command_service]
+        if "technical" not in self.command_service_type:
+            self._technical = None
+
         return True
 
     def after_read(self):
@@ -244,28 +319,135 @@ class Handler(GenericDevice):
         self.variables_dict = variables_dict
 
         if self.before_read():
-            for command_service in self.command_service_type:
-                service_read = self._read_service(command_service)
-                if service_read:
-                    output += service_read
+            with metrics.timer("read_seconds"):
+                for command_service in self.command_service_type:
+                    service_read = self._read_service(command_service)
+                    if service_read:
+                        output += service_read
+            self._save_progress()
+            self._schedule_retries()
         logger.info(output)
 
         self.after_read()
         return output
 
-    def _read_service(self, command_service):
-        self.inst.set_client(command_service=command_service)
+    def _save_progress(self):
+        """
+        save the dates read once their values are stored and the next reads
+        """
+        if not hasattr(self._device, "sgetiersdevice"):
+            return
+        with transaction.atomic():
+            for command_service, poll in self.next_polls.items():
+                SGETiersCheckpoint.objects.update_or_create(
+                    sgetiers_device=self._device.sgetiersdevice,
+                    command_service_type=command_service,
+                    defaults={"next_poll": poll},
+                )
+            existing = SGETiersVariable.objects.filter(
+                pk__in=self.coverage.keys()
+            ).values_list("pk", flat=True)
+            for sgetiers_variable_id in existing:
+                ranges = self.coverage[sgetiers_variable_id]
+                coverage = SGETiersCoverage.objects.filter(
+                    sgetiers_variable_id=sgetiers_variable_id
+                )
+                ranges = merge_ranges(ranges + [(c.start, c.end) for c in coverage])
+                coverage.delete()
+                SGETiersCoverage.objects.bulk_create(
+                    [
+                        SGETiersCoverage(
+                            sgetiers_variable_id=sgetiers_variable_id,
+                            start=start,
+                            end=end,
+                        )
+                        for start, end in ranges
+                    ]
+                )
+        self.coverage = {}
+        self.next_polls = {}
+
+    def _get_schedule(self):
+        """
+        return {command_service: next read time} saved for the device
+        """
+        if not hasattr(self._device, "sgetiersdevice"):
+            return {}
+        return dict(
+            SGETiersCheckpoint.objects.filter(
+                sgetiers_device=self._device.sgetiersdevice, next_poll__isnull=False
+            ).values_list("command_service_type", "next_poll")
+        )
+
+    def _is_due(self, command_service, schedule, now=None):
+        """
+        return True if the service is due by its schedule or has a deferred request to retry
+        """
+        if now is None:
+            now = timezone.now()
+        if any(key[0] == command_service for key in self.retries.due()):
+            return True
+        if (command_service,) in self.retries:
+            # waiting for the retry of the request
+            return False
+        return command_service not in schedule or schedule[command_service] <= now
+
+    def _schedule_retries(self):
+        """
+        add a device read task for the next deferred request
+        """
+        next_try = self.retries.next_try()
+        if next_try is None:
+            return
+        if not DeviceReadTask.objects.filter(
+            device=self._device,
+            done=False,
+            failed=False,
+            start__gt=time(),
+            start__lte=next_try,
+        ).exists():
+            DeviceReadTask(device=self._device, start=next_try).save()
+            logger.info(
+                f"{len(self.retries)} requests deferred for {self._device}, next try at {datetime.fromtimestamp(next_try)}"
+            )
+
+    def _send_request(self, inputs, command_service):
+        """
+        send the request, count its duration, result and size
+        """
+        labels = dict(device=str(self._device), service=command_service)
+        with metrics.timer("request_seconds", service=command_service):
+            r = self.inst.send_request(input_dict=inputs)
+        if isinstance(r, (bytes, bytearray)):
+            metrics.inc("requests_total", result="ok", **labels)
+            metrics.inc("response_bytes_total", len(r), **labels)
+        else:
+            metrics.inc("requests_total", result="error", **labels)
+        return r
+
+    def _count_error(self, command_service, error):
+        metrics.inc(
+            "errors_total",
+            device=str(self._device),
+            service=command_service,
+            code=get_error_code(error) or type(error).__name__,
+        )
+
+    def _get_inputs(self):
         accord_client = (
             "ACCORD_CLIENT" if self._device.sgetiersdevice.authorization else ""
         )
-
-        self.inputs = {
+        return {
             "login": self._device.sgetiersdevice.login,
             "prm": self._device.sgetiersdevice.pdl,
             "autorisation": self._device.sgetiersdevice.authorization,
             "cadre": accord_client,
             "corrigee": False,
         }
+
+    def _read_service(self, command_service):
+        self.inst.set_client(command_service=command_service)
+        self.inputs = self._get_inputs()
         if command_service == "technical":
             return self._read_technical()
         if command_service == "detailsV3-COURBE-PA":
@@ -289,181 +471,485 @@ class Handler(GenericDevice):
                 "INDEX", "HP", "detailsV3-INDEX-HP"
             )
 
+    def needs_technical(self):
+        """
+        return True if a variable of the device is read from the technical data
+        and the technical data is due
+        """
+        return any(
+            hasattr(var, "sgetiersvariable")
+            and var.sgetiersvariable.command_service_type == "technical"
+            for var in self._variables.values()
+        ) and self._is_due("technical", self._get_schedule())
+
+    def prefetch_technical(self):
+        """
+        request the technical data before the read, see pyscada.enedis.technical
+        """
+        if self.inst is None and not self.connect():
+            return
+        self.inst.set_client(command_service="technical")
+        self.inputs = self._get_inputs()
+        self._technical = self._request_technical(
+            [
+                var.sgetiersvariable.xml_path
+                for var in self._variables.values()
+                if hasattr(var, "sgetiersvariable")
+                and var.sgetiersvariable.command_service_type == "technical"
+            ]
+        )
+
+    def _request_technical(self, xml_paths):
+        """
+        return the read time and the texts found for each xml path, None if the request failed
+        """
+        read_time = time()
+        key = ("technical",)
+        r = None
+        try:
+            r = self._send_request(self.inputs, "technical")
+            with metrics.timer("parse_seconds", service="technical"):
+                texts = extract_points(r, xml_paths, fields=None)
+        except Exception as e:
+            error = r if isinstance(r, Exception) else e
+            logger.info(f"Read technical failed for {self._device} : {error}")
+            self._count_error("technical", error)
+            self._defer(key, classify_error(error))
+            return read_time, None
+        self.retries.done(key)
+        return read_time, texts
+
     def _read_technical(self):
         output = []
-        read_time = time()
-        for i in range(0, 10):
-            # try 10 times max
-            try:
-                r = self.inst.send_request(input_dict=self.inputs)
-                root = ET.fromstring(r)
-            except Exception as e:
-                logger.info(f"Read technical failed {i} for {self._device} : {e}")
-                sleep(2)
-            else:
-                for var_id in self.command_service_type["technical"]:
-                    if var_id not in self._variables:
-                        logger.warning(f"Variable {var_id} not in self.variables")
-                    if var_id not in self.variables_dict:
-                        logger.warning(f"Variable {var_id} not in self.variables_dict")
-                    var = self.variables_dict[var_id]
-                    sgetiers_var = var.sgetiersvariable
-                    value = root.findall(sgetiers_var.xml_path)
-                    if len(value) == 0:
-                        logger.warning(
-                            f"Variable {var} not found in technical data ({sgetiers_var.xml_path})"
-                        )
-                        continue
-                    elif len(value) > 1:
-                        logger.info(
-                            "Variable {var} found more than one time in technical data ({sgetiers_var.xml_path})"
-                        )
-                    value = value[0].text
-                    if (
-                        value is not None
-                        and value != ""
-                        and var.update_values([value], [read_time])
-                    ):
-                        output.append(var)
-                break
+        xml_paths = {}
+        for var_id in self.command_service_type["technical"]:
+            if var_id not in self._variables:
+                logger.warning(f"Variable {var_id} not in self.variables")
+            if var_id not in self.variables_dict:
+                logger.warning(f"Variable {var_id} not in self.variables_dict")
+            xml_paths[var_id] = self.variables_dict[var_id].sgetiersvariable.xml_path
+        # use the technical data requested with the other devices of the login if any
+        technical, self._technical = self._technical, None
+        if technical is None or (
+            technical[1] is not None
+            and not set(xml_paths.values()).issubset(technical[1])
+        ):
+            technical = self._request_technical(xml_paths.values())
+        read_time, texts = technical
+        if ("technical",) not in self.retries:
+            # read or will not be retried
+            self.next_polls["technical"] = next_poll("technical", self._device.pk)
+        if texts is None:
+            return output
+        for var_id, xml_path in xml_paths.items():
+            var = self.variables_dict[var_id]
+            value = texts[xml_path]
+            if len(value) == 0:
+                logger.warning(
+                    f"Variable {var} not found in technical data ({xml_path})"
+                )
+                continue
+            elif len(value) > 1:
+                logger.info(
+                    f"Variable {var} found more than one time in technical data ({xml_path})"
+                )
+            value = value[0]
+            if (
+                value is not None
+                and value != ""
+                and var.update_values([value], [read_time])
+            ):
+                output.append(var)
+        metrics.inc(
+            "points_written_total",
+            len(output),
+            device=str(self._device),
+            service="technical",
+        )
         return output
 
+    def _defer(self, key, category, count=True):
+        """
+        retry the request in a later read, functional errors are not retried
+        return False if the request will not be retried
+        """
+        if self.retries.defer(key, category, count) is not None:
+            metrics.inc("deferred_total", device=str(self._device), service=key[0])
+            return True
+        if category != FUNCTIONAL:
+            logger.warning(
+                f"Request {key} for {self._device} failed {self.retries.max_attempts} times, giving up"
+            )
+        return False
+
     def _read_detailsV3_grandeur_points(
         self, command_type, courbe_type, command_service
     ):
-        self.inputs["type"] = command_type
-        self.inputs["courbe_type"] = courbe_type
         months_offset_max = 24
         if "COURBE" not in command_service:
             months_offset_max = 36
-        t_from = date.fromtimestamp(
-            self._get_min_time_for_command_service_type(
-                command_service, months_offset_max
-            )
+        horizon = (
+            date.today() - relativedelta(months=months_offset_max) + timedelta(days=1)
         )
-        logger.info(f"Starting to read {command_service} from {t_from}")
-        stop = False
-        variables_values = {}
-        variables_timestamps = {}
-        output = []
-        while not stop:
-            t_to = t_from + timedelta(days=6)
-            if "COURBE" not in command_service:
-                t_to = date.today()
-            if t_to > (date.today() - timedelta(days=1)):
-                stop = True
-                t_to = date.today() - timedelta(days=1)
-            if t_to == t_from:
-                break
-            self.inputs["from"] = t_from.isoformat()
-            self.inputs["to"] = t_to.isoformat()
-            for i in range(0, 10):
-                # try 10 times max
-                logger.info(self.inputs)
-                try:
-                    r = self.inst.send_request(input_dict=self.inputs)
-                    root = ET.fromstring(r)
-                except TypeError as e:
-                    if "SGT4" in str(r):
-                        logger.info(f"Functionnal Error : {self.inputs} {e} {r}")
-                        break
-                    elif "SGT589" in str(r):
-                        logger.info(f"Technical Error : {self.inputs} {e} {r}")
-                        stop = True
-                        break
-                    elif "SGT5" in str(r):
-                        logger.info(f"Technical Error : {self.inputs} {e} {r}")
-                    else:
-                        logger.info(f"Unknown error : {self.inputs} {e} {r}")
-
-                except Exception as e:
-                    logger.warning(
-                        f"Read {command_service} failed {i} for {self._device} : {e}"
-                    )
-                    sleep(2)
-                else:
-                    for var_id in self.command_service_type[command_service]:
-                        if var_id not in self._variables:
-                            logger.warning(f"Variable {var_id} not in self.variables")
-                        if var_id not in self.variables_dict:
-                            logger.warning(
-                                f"Variable {var_id} not in self.variables_dict"
-                            )
-                        var = self.variables_dict[var_id]
-                        sgetiers_var = var.sgetiersvariable
-                        result = root.findall(sgetiers_var.xml_path)
-                        if len(result) == 0:
-                            logger.warning(
-                                f"Variable {var} not found in detailed V3({sgetiers_var.xml_path})"
-                            )
-                            continue
-                        if var_id not in variables_values:
-                            variables_values[var_id] = []
-                            variables_timestamps[var_id] = []
-                        for r in result:
-                            try:
-                                d = r.findall("d")
-                                if len(d) == 0:
-                                    logger.warning(
-                                        f"date not found in detailsV3 Courbe PA"
-                                    )
-                                    continue
-                                if len(d) > 1:
-                                    logger.warning(
-                                        f"more than one date found in detailsV3 Courbe PA"
-                                    )
-                                d = datetime.fromisoformat(d[0].text)
-                                paris = timezone("Europe/Paris")
-                                try:
-                                    d = paris.localize(d, is_dst=None).astimezone(utc)
-                                except AmbiguousTimeError:
-                                    # date time is at the daylight saving time (summer/winter change), not possible to determine, set -1h offset
-                                    d -= timedelta(seconds=3600)
-                                d = d.timestamp()
-                            except ValueError:
-                                logger.warning(
-                                    f"Reading {var} - date format from SGETiers invalid for detailsV3 Courbe PA : {date_list[i].text}"
-                                )
-                                continue
-                            v = r.findall("v")
-                            if len(v) == 0:
-                                logger.warning(
-                                    f"value not found in detailsV3 Courbe PA"
-                                )
-                                continue
-                            if len(v) > 1:
-                                logger.warning(
-                                    f"more than one value found in detailsV3 Courbe PA"
-                                )
-                            v = v[0].text
-                            variables_values[var_id].append(v)
-                            variables_timestamps[var_id].append(d)
-                        logger.info(f"{var} length : {len(variables_values[var_id])}")
-                    break
-            t_from = t_to
+        yesterday = date.today() - timedelta(days=1)
+        xml_paths = {}
         for var_id in self.command_service_type[command_service]:
+            if var_id not in self._variables:
+                logger.warning(f"Variable {var_id} not in self.variables")
+            if var_id not in self.variables_dict:
+                logger.warning(f"Variable {var_id} not in self.variables_dict")
+            xml_paths[var_id] = self.variables_dict[var_id].sgetiersvariable.xml_path
+        coverage = self._get_detailsV3_coverage(command_service, horizon)
+        windows = self._get_detailsV3_windows(
+            coverage, horizon, yesterday, command_service
+        )
+        if len(windows) == 0:
+            logger.info(f"{command_service} already read up to {yesterday}")
+            self._update_next_poll(command_service, coverage, horizon, yesterday)
+            return []
+        logger.info(f"Starting to read {command_service} from {min(windows)[0]}")
+        service_read = DetailsV3Read(
+            command_type, courbe_type, command_service, xml_paths, windows
+        )
+
+        # the values are written every flush_windows windows or flush_points points
+        # to bound the memory and keep the progress of a long read
+        flush_windows = max(1, int(get_setting("detailsV3_flush_windows")))
+        flush_points = max(1, int(get_setting("detailsV3_flush_points")))
+        pending = {}
+        pending_windows = 0
+        pending_points = 0
+        for window, result in self._read_detailsV3_windows(
+            sorted(windows), service_read
+        ):
+            for var_id, (values, timestamps) in result.items():
+                pending.setdefault(var_id, []).append((values, timestamps))
+                pending_points += len(values)
+            service_read.complete(*window)
+            pending_windows += 1
+            if pending_windows >= flush_windows or pending_points >= flush_points:
+                self._flush_detailsV3(
+                    service_read, pending, coverage, horizon, yesterday
+                )
+                pending = {}
+                pending_windows = 0
+                pending_points = 0
+        self._flush_detailsV3(service_read, pending, coverage, horizon, yesterday)
+        return self._output_latest(service_read)
+
+    def _flush_detailsV3(self, service_read, pending, coverage, horizon, yesterday):
+        """
+        write the values read to the recorded data in bulk except the latest point
+        of each variable returned to the DAQ process at the end of the read,
+        and save the windows read and the next read in the same transaction
+        """
+        command_service = service_read.command_service
+        labels = dict(device=str(self._device), service=command_service)
+        with transaction.atomic():
+            for var_id, arrays in pending.items():
+                var = self.variables_dict[var_id]
+                values = np.concatenate([values for values, timestamps in arrays])
+                timestamps = np.concatenate(
+                    [timestamps for values, timestamps in arrays]
+                )
+                values, timestamps = service_read.hold_latest(
+                    var_id, values, timestamps
+                )
+                with metrics.timer("write_seconds", service=command_service):
+                    received, duplicates, written = bulk_write(var, values, timestamps)
+                logger.info(
+                    f"{var} : {received} points received, {written} written, {duplicates} already stored or repeated"
+                )
+                metrics.inc("points_written_total", written, **labels)
+                metrics.inc("points_duplicated_total", duplicates, **labels)
+
+            for var_id, ranges in service_read.pop_covered().items():
+                coverage[var_id] = merge_ranges(coverage[var_id] + ranges)
+                sgetiers_variable_id = self.variables_dict[var_id].sgetiersvariable.pk
+                self.coverage.setdefault(sgetiers_variable_id, []).extend(ranges)
+            self._update_next_poll(command_service, coverage, horizon, yesterday)
+            self._save_progress()
+
+    def _output_latest(self, service_read):
+        """
+        update the variables with their latest point read, like the other protocols,
+        and return them to let the DAQ process write it and send it to its outputs
+        """
+        output = []
+        for var_id, (value, timestamp) in service_read.latest.items():
             var = self.variables_dict[var_id]
-            if var_id in variables_values and var.update_values(
-                variables_values[var_id], variables_timestamps[var_id]
-            ):
+            if var.update_values([value], [timestamp]):
                 output.append(var)
-            logger.info(len(output))
         return output
 
-    def _get_min_time_for_command_service_type(
-        self, command_service, months_offset_max=24
-    ):
-        time_min = time()
-        logger.info(command_service)
-        for var_id in self.command_service_type[command_service]:
-            if self.variables_dict[var_id].query_prev_value():
-                time_min = min(time_min, self.variables_dict[var_id].timestamp_old)
+    def _update_next_poll(self, command_service, coverage, horizon, yesterday):
+        """
+        set the next read of the service, at the next publication
+        once all the dates up to yesterday are read, the reads resume from the coverage
+        """
+        complete = all(
+            len(missing_ranges(ranges, horizon, yesterday)) == 0
+            for ranges in coverage.values()
+        )
+        self.next_polls[command_service] = next_poll(
+            command_service, self._device.pk, complete
+        )
+
+    def _get_detailsV3_coverage(self, command_service, horizon):
+        """
+        return {var_id: [(start, end), ...]} the dates stored for each variable of the service,
+        the coverage of a variable without one starts from its last value stored
+        """
+        var_ids = {
+            self.variables_dict[var_id].sgetiersvariable.pk: var_id
+            for var_id in self.command_service_type[command_service]
+        }
+        coverage = {var_id: [] for var_id in var_ids.values()}
+        for c in SGETiersCoverage.objects.filter(sgetiers_variable__in=var_ids.keys()):
+            coverage[var_ids[c.sgetiers_variable_id]].append((c.start, c.end))
+        seeds = []
+        for sgetiers_variable_id, var_id in var_ids.items():
+            if len(coverage[var_id]):
+                coverage[var_id] = merge_ranges(coverage[var_id])
+                continue
+            var = self.variables_dict[var_id]
+            if var.query_prev_value():
+                end = date.fromtimestamp(var.timestamp_old)
+                if end > horizon:
+                    coverage[var_id] = [(horizon, end)]
+                    seeds.append(
+                        SGETiersCoverage(
+                            sgetiers_variable_id=sgetiers_variable_id,
+                            start=horizon,
+                            end=end,
+                        )
+                    )
+        if len(seeds):
+            SGETiersCoverage.objects.bulk_create(seeds)
+        return coverage
+
+    def _get_detailsV3_windows(self, coverage, horizon, yesterday, command_service):
+        """
+        return {(from, to): [var_id, ...]} the windows to request with the variables missing them :
+        the dates missing for a variable in 6 days windows for the curves or one window for the other types,
+        and the deferred windows which can be retried
+        """
+        deferred = [key[1:] for key in self.retries.keys() if key[0] == command_service]
+        missing = {
+            var_id: missing_ranges(ranges, horizon, yesterday)
+            for var_id, ranges in coverage.items()
+        }
+        # the deferred windows are requested again once due only
+        to_read = merge_ranges(
+            r
+            for ranges in coverage.values()
+            for r in missing_ranges(ranges + deferred, horizon, yesterday)
+        )
+        length = timedelta(days=6) if "COURBE" in command_service else None
+        planned = split_ranges(to_read, length)
+        for key in self.retries.due():
+            if key[0] == command_service and key[1:] not in planned:
+                planned.append(key[1:])
+
+        windows = {}
+        for t_from, t_to in planned:
+            var_ids = [
+                var_id
+                for var_id, ranges in missing.items()
+                if overlaps(ranges, t_from, t_to)
+            ]
+            if len(var_ids):
+                windows[(t_from, t_to)] = var_ids
+            else:
+                # already read for all the variables
+                self.retries.done((command_service, t_from, t_to))
+        return windows
+
+    def _read_detailsV3_windows(self, windows, service_read):
+        """
+        read the windows one after the other or using a pool of threads,
+        yield ((from, to), result) in the windows order for the windows which will not be requested again
+        """
+        concurrency = int(get_setting("detailsV3_concurrency"))
+        if concurrency <= 1 or len(windows) <= 1:
+            for t_from, t_to in windows:
+                result = self._read_detailsV3_window(t_from, t_to, service_read)
+                if result is not None:
+                    yield (t_from, t_to), result
+            return
+
+        # submitted by chunks to keep only the results of a chunk in memory
+        chunk_size = max(concurrency, int(get_setting("detailsV3_flush_windows")))
+        with ThreadPoolExecutor(
+            max_workers=min(concurrency, len(windows)),
+            thread_name_prefix=f"enedis-{self._device}",
+        ) as executor:
+            for start in range(0, len(windows), chunk_size):
+                chunk = windows[start : start + chunk_size]
+                futures = [
+                    executor.submit(
+                        self._read_detailsV3_window, t_from, t_to, service_read
+                    )
+                    for t_from, t_to in chunk
+                ]
+                for window, future in zip(chunk, futures):
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        logger.warning(
+                            f"Read {service_read.command_service} failed for {self._device} : {e}"
+                        )
+                        continue
+                    if result is not None:
+                        yield window, result
+
+    def _read_detailsV3_window(self, t_from, t_to, service_read):
+        """
+        request one window, return {var_id: (values, timestamps)}, empty if the request failed
+        and will not be retried, or None if the window is deferred.
+        Set the stop event if the quota is exceeded
+        """
+        command_service = service_read.command_service
+        key = (command_service, t_from, t_to)
+        if service_read.stop.is_set():
+            # not sent because of the quota
+            self._defer(key, QUOTA, count=False)
+            return None
+        inputs = dict(self.inputs)
+        inputs["type"] = service_read.command_type
+        inputs["courbe_type"] = service_read.courbe_type
+        inputs["from"] = t_from.isoformat()
+        inputs["to"] = t_to.isoformat()
+        logger.info(inputs)
+        r = None
+        try:
+            xml_paths = service_read.get_xml_paths(t_from, t_to)
+            r = self._send_request(inputs, command_service)
+            parse_start = perf_counter()
+            points = extract_points(r, xml_paths.values())
+        except Exception as e:
+            error = r if isinstance(r, Exception) else e
+            self._count_error(command_service, error)
+            category = classify_error(error)
+            if category == FUNCTIONAL:
+                logger.info(f"Functionnal Error : {inputs} {error}")
+            elif category == QUOTA:
+                logger.info(f"Quota exceeded : {inputs} {error}")
+                service_read.stop.set()
+            elif category == TECHNICAL:
+                logger.info(f"Technical Error : {inputs} {error}")
             else:
-                time_min = (
-                    datetime.today()
-                    - relativedelta(months=months_offset_max)
-                    + relativedelta(days=1)
-                ).timestamp()
-                break
-        logger.info(f"time_min : {time_min}")
-        return time_min
+                logger.warning(
+                    f"Read {command_service} failed for {self._device} : {error}"
+                )
+            if not self._defer(key, category):
+                # will not be requested again
+                return {}
+            return None
+        self.retries.done(key)
+        result = self._get_detailsV3_points(points, xml_paths)
+        metrics.observe(
+            "parse_seconds", perf_counter() - parse_start, service=command_service
+        )
+        metrics.inc(
+            "points_extracted_total",
+            sum(len(values) for values, timestamps in result.values()),
+            device=str(self._device),
+            service=command_service,
+        )
+        return result
+
+    def _get_detailsV3_points(self, points, xml_paths):
+        """
+        convert the (date, value) texts found for each variable in a detailsV3 response
+        to float64 arrays of values and timestamps.
+        The dates of each variable are converted separately : the first occurrence of
+        a repeated local time is the summer time in the series of each variable
+        """
+        result = {}
+        for var_id, xml_path in xml_paths.items():
+            if len(points[xml_path]) == 0:
+                logger.warning(
+                    f"Variable {var_id} not found in detailed V3({xml_path})"
+                )
+                continue
+            var_points = [(d, v) for d, v in points[xml_path] if None not in (d, v)]
+            if len(var_points) < len(points[xml_path]):
+                logger.warning(
+                    f"date or value not found in detailsV3 for {len(points[xml_path]) - len(var_points)} points of {var_id}"
+                )
+            timestamps, var_valid = local_to_utc_timestamps([d for d, v in var_points])
+            if not var_valid.all():
+                logger.warning(
+                    f"Reading {var_id} - date format from SGETiers invalid for {(~var_valid).sum()} points in detailsV3"
+                )
+            values, values_valid = text_to_float([v for d, v in var_points])
+            if not values_valid.all():
+                logger.warning(
+                    f"Reading {var_id} - value format from SGETiers invalid for {(~values_valid).sum()} points in detailsV3"
+                )
+            var_valid = var_valid & values_valid
+            result[var_id] = (values[var_valid], timestamps[var_valid])
+        return result
+
+
+class DetailsV3Read(object):
+    """
+    state shared by the threads reading the windows of a detailsV3 command service
+    """
+
+    def __init__(self, command_type, courbe_type, command_service, xml_paths, windows):
+        self.command_type = command_type
+        self.courbe_type = courbe_type
+        self.command_service = command_service
+        self.xml_paths = xml_paths
+        # {(from, to): [var_id, ...]} variables missing each window
+        self.windows = windows
+        # set when the quota is exceeded
+        self.stop = Event()
+        # {var_id: [(from, to), ...]} windows read for each variable and not saved yet
+        self.covered = {}
+        # {var_id: (value, timestamp)} latest point read for each variable
+        self.latest = {}
+        self._lock = Lock()
+
+    def get_xml_paths(self, t_from, t_to):
+        """
+        return {var_id: xml_path} of the variables missing the window
+        """
+        return {
+            var_id: self.xml_paths[var_id] for var_id in self.windows[(t_from, t_to)]
+        }
+
+    def complete(self, t_from, t_to):
+        """
+        mark a window as read for the variables missing it
+        """
+        with self._lock:
+            for var_id in self.windows[(t_from, t_to)]:
+                self.covered.setdefault(var_id, []).append((t_from, t_to))
+
+    def hold_latest(self, var_id, values, timestamps):
+        """
+        keep the latest point of the variable until the end of the read,
+        return the other points and the point kept before if a later one is found
+        """
+        held = self.latest.get(var_id)
+        if len(timestamps) and (held is None or timestamps.max() > held[1]):
+            i = int(np.argmax(timestamps))
+            self.latest[var_id] = (float(values[i]), float(timestamps[i]))
+            if held is not None:
+                values = np.append(values, held[0])
+                timestamps = np.append(timestamps, held[1])
+        if var_id not in self.latest:
+            return values, timestamps
+        keep = timestamps != self.latest[var_id][1]
+        return values[keep], timestamps[keep]
+
+    def pop_covered(self):
+        """
+        return and forget the windows read since the last call
+        """
+        with self._lock:
+            covered, self.covered = self.covered, {}
+        return covered
@@ -0,0 +1,307 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from pyscada.models import Device, DeviceHandler
+from pyscada.enedis import PROTOCOL_ID
+from pyscada.enedis.models import SGETiersDevice, SGETiersField
+from pyscada.enedis.provisioning import provision_variables
+from pyscada.enedis.reinit import schedule_reinit
+
+import csv
+import json
+import os
+import re
+
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+CERTIFICATES_DIR = "/home/pyscada/enedisCertificates"
+# max number of devices created by each transaction
+BATCH_SIZE = 500
+# separator of the fields of a CSV row
+FIELDS_SEPARATOR = ";"
+TRUE_VALUES = ("1", "true", "yes", "oui", "y", "o")
+# characters read at once from a JSON list file
+JSON_CHUNK_SIZE = 64 * 1024
+WHITESPACE_RE = re.compile(r"\s*")
+
+
+def read_rows(file_path, file_format=None):
+    """
+    yield the rows of a CSV file with a header, a JSON list or a JSON lines file
+    as dicts, the files are read one row at a time
+    """
+    if file_format is None:
+        file_format = os.path.splitext(file_path)[1].lstrip(".").lower()
+    if file_format == "csv":
+        with open(file_path, newline="", encoding="utf-8-sig") as f:
+            yield from csv.DictReader(f)
+    elif file_format == "jsonl":
+        with open(file_path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip() != "":
+                    yield json.loads(line)
+    elif file_format == "json":
+        with open(file_path, encoding="utf-8") as f:
+            yield from read_json_list(f)
+    else:
+        raise ValueError(f"Unknown file format {file_format}, use csv, json or jsonl")
+
+
+def read_json_list(f, chunk_size=JSON_CHUNK_SIZE):
+    """
+    yield the items of the JSON list of a file, decoded one at a time
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    pos = 0
+    eof = False
+    # next token expected : "[", an item or "]" after "[", "," or "]", an item
+    expected = "["
+    while True:
+        pos = WHITESPACE_RE.match(buffer, pos).end()
+        if not eof and len(buffer) - pos < chunk_size:
+            chunk = f.read(chunk_size)
+            eof = chunk == ""
+            buffer = buffer[pos:] + chunk
+            pos = 0
+            continue
+        if expected == "[":
+            if not buffer.startswith("[", pos):
+                raise ValueError("The JSON file is not a list")
+            pos += 1
+            expected = "item or ]"
+        elif expected != "item" and buffer.startswith("]", pos):
+            if buffer[pos + 1 :].strip() != "" or f.read().strip() != "":
+                raise ValueError("Extra data after the JSON list")
+            return
+        elif expected == ", or ]":
+            if not buffer.startswith(",", pos):
+                raise ValueError("Invalid JSON list, expecting ',' or ']'")
+            pos += 1
+            expected = "item"
+        else:
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+                following = WHITESPACE_RE.match(buffer, end).end()
+                following = buffer[following : following + 1]
+            except ValueError:
+                if eof:
+                    raise
+                end = None
+            if end is None or not eof and following not in (",", "]"):
+                # the item or the number can continue in the next chunk
+                chunk = f.read(chunk_size)
+                eof = chunk == ""
+                buffer = buffer[pos:] + chunk
+                pos = 0
+                continue
+            pos = end
+            expected = ", or ]"
+            yield item
+
+
+def _certificate_path(file_name):
+    file_name = (file_name or "").strip()
+    if file_name == "" or os.path.isabs(file_name):
+        return file_name
+    return os.path.join(CERTIFICATES_DIR, file_name)
+
+
+def _to_bool(value):
+    if isinstance(value, bool):
+        return value
+    return str(value or "").strip().lower() in TRUE_VALUES
+
+
+def get_fields_by_key():
+    """
+    return {id or label: SGETiersField} to find the fields of a row
+    """
+    fields = {}
+    for field in SGETiersField.objects.all():
+        fields[str(field.pk)] = field
+        fields[field.label] = field
+    fields["all"] = None
+    return fields
+
+
+def parse_row(row, fields_by_key):
+    """
+    return (SGETiersDevice, short name, [SGETiersField, ...]) from a row with the prm,
+    login, certificate, key, authorization, fields and optional name keys,
+    raise ValidationError with the clean() rules of SGETiersDevice
+    or if the certificate or key file does not exist
+    """
+    prm = str(row.get("prm") or "").strip()
+    if not prm.isdigit():
+        raise ValidationError(f"Invalid PRM {prm}")
+    sgetiers_device = SGETiersDevice(
+        login=(row.get("login") or "").strip(),
+        certificat=_certificate_path(row.get("certificate")),
+        private_key=_certificate_path(row.get("key")),
+        pdl=int(prm),
+        authorization=_to_bool(row.get("authorization")),
+    )
+    sgetiers_device.clean()
+    for label, file_path in (
+        ("certificate", sgetiers_device.certificat),
+        ("private key", sgetiers_device.private_key),
+    ):
+        if not os.path.isfile(file_path):
+            raise ValidationError(f"The {label} file {file_path} does not exist")
+
+    keys = row.get("fields") or []
+    if isinstance(keys, str):
+        keys = keys.split(FIELDS_SEPARATOR)
+    fields = {}
+    for key in keys:
+        key = str(key).strip()
+        if key == "":
+            continue
+        if key not in fields_by_key:
+            raise ValidationError(f"Unknown SGE Tiers field {key}")
+        if fields_by_key[key] is None:
+            # all the fields
+            for field in fields_by_key.values():
+                if field is not None:
+                    fields[field.pk] = field
+        else:
+            fields[fields_by_key[key].pk] = fields_by_key[key]
+    name = str(row.get("name") or "").strip() or prm
+    return sgetiers_device, name, list(fields.values())
+
+
+class ImportResult(object):
+    """
+    counts of an import, updated after each batch,
+    the devices created are the devices which would be created by a dry run
+    """
+
+    def __init__(self, dry_run=False):
+        self.dry_run = dry_run
+        self.rows = 0
+        self.created = 0
+        self.skipped = 0
+        self.variables = 0
+        # [(row number, message), ...]
+        self.errors = []
+
+    def __str__(self):
+        if self.dry_run:
+            return (
+                f"{self.rows} rows read, {self.created} devices would be created, "
+                f"{self.skipped} skipped, {len(self.errors)} errors"
+            )
+        return (
+            f"{self.rows} rows read, {self.created} devices created, "
+            f"{self.skipped} skipped, {self.variables} variables created, "
+            f"{len(self.errors)} errors"
+        )
+
+
+def import_devices(rows, batch_size=BATCH_SIZE, dry_run=False, progress=None):
+    """
+    create the Devices, SGETiersDevices and variables of the rows by batches,
+    each batch in a transaction. The PRM already existing are skipped.
+    progress(result) is called after each batch.
+    Return the ImportResult
+    """
+    result = ImportResult(dry_run)
+    fields_by_key = get_fields_by_key()
+    batch = []
+    for row in rows:
+        result.rows += 1
+        try:
+            batch.append(parse_row(row, fields_by_key))
+        except (ValidationError, ValueError, TypeError, AttributeError) as e:
+            message = "; ".join(e.messages) if isinstance(e, ValidationError) else e
+            result.errors.append((result.rows, str(message)))
+        if len(batch) >= batch_size:
+            _import_batch(batch, result, dry_run)
+            batch = []
+            if progress is not None:
+                progress(result)
+    if len(batch):
+        _import_batch(batch, result, dry_run)
+        if progress is not None:
+            progress(result)
+    return result
+
+
+def _import_batch(batch, result, dry_run):
+    existing = set(
+        SGETiersDevice.objects.filter(
+            pdl__in=[sgetiers_device.pdl for sgetiers_device, name, fields in batch]
+        ).values_list("pdl", flat=True)
+    )
+    new = []
+    for sgetiers_device, name, fields in batch:
+        if sgetiers_device.pdl in existing:
+            result.skipped += 1
+            continue
+        # a PRM repeated in the file is created once
+        existing.add(sgetiers_device.pdl)
+        new.append((sgetiers_device, name, fields))
+    if dry_run or len(new) == 0:
+        result.created += len(new)
+        return
+
+    handler = DeviceHandler.objects.filter(
+        handler_class="pyscada.enedis.devices.enedis"
+    ).first()
+    poll = SGETiersDevice.default_polling_interval()
+    with transaction.atomic():
+        devices = [
+            Device(
+                short_name=name,
+                protocol_id=PROTOCOL_ID,
+                instrument_handler=handler,
+                polling_interval=poll,
+            )
+            for sgetiers_device, name, fields in new
+        ]
+        if connection.features.can_return_rows_from_bulk_insert:
+            devices = Device.objects.bulk_create(devices)
+        else:
+            # the ids of the rows inserted are needed
+            for device in devices:
+                device.save()
+        for device, (sgetiers_device, name, fields) in zip(devices, new):
+            sgetiers_device.sgetiers_device = device
+        # bulk_create does not call SGETiersDevice.save which saves the device again
+        SGETiersDevice.objects.bulk_create(
+            [sgetiers_device for sgetiers_device, name, fields in new]
+        )
+        sgetiers_devices = {
+            sgetiers_device.sgetiers_device_id: sgetiers_device
+            for sgetiers_device in SGETiersDevice.objects.filter(
+                sgetiers_device__in=devices
+            ).select_related("sgetiers_device")
+        }
+
+        through = SGETiersDevice.auto_create_variables.through
+        links = []
+        # {(field id, ...): ([SGETiersDevice, ...], [SGETiersField, ...])}
+        field_sets = {}
+        for device, (sgetiers_device, name, fields) in zip(devices, new):
+            sgetiers_device = sgetiers_devices[device.pk]
+            for field in fields:
+                links.append(
+                    through(
+                        sgetiersdevice_id=sgetiers_device.pk, sgetiersfield_id=field.pk
+                    )
+                )
+            key = tuple(sorted(field.pk for field in fields))
+            field_sets.setdefault(key, ([], fields))[0].append(sgetiers_device)
+        through.objects.bulk_create(links, batch_size=BATCH_SIZE)
+        for group, fields in field_sets.values():
+            if len(fields):
+                created, updated = provision_variables(group, fields, reinit=False)
+                result.variables += created
+    result.created += len(new)
+    schedule_reinit(devices)
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from pyscada.enedis.utils import get_setting
+
+import numpy as np
+from django.utils.timezone import now
+from pyscada.models import RecordedData
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+# RecordedData id = timestamp in milliseconds * 2**21 + variable id
+ID_FACTOR = 2097152
+
+
+def scale_values(variable, values):
+    """
+    apply the scaling of the variable to the values at once, like Scaling.scale_value
+    """
+    scaling = variable.scaling
+    if scaling is None:
+        return values
+    if scaling.limit_input:
+        values = np.clip(values, scaling.input_low, scaling.input_high)
+    values = (values - scaling.input_low) / (scaling.input_high - scaling.input_low)
+    return values * (scaling.output_high - scaling.output_low) + scaling.output_low
+
+
+def recorded_data_ids(variable, timestamps):
+    """
+    return the RecordedData ids of the timestamps (seconds) of the variable
+    """
+    milliseconds = (np.asarray(timestamps, dtype=np.float64) * 1000).astype(np.int64)
+    return milliseconds * ID_FACTOR + variable.pk
+
+
+def bulk_write(variable, values, timestamps, batch_size=None):
+    """
+    write the values of the variable straight to the recorded data with bulk_create.
+    A point is identified by its variable and timestamp : the points repeated in the values
+    (the first one is kept) or already stored are not written.
+    Return (received, duplicates, written) counts
+    """
+    if batch_size is None:
+        batch_size = get_setting("bulk_batch_size")
+    batch_size = max(1, int(batch_size))
+    values = scale_values(variable, np.asarray(values, dtype=np.float64))
+    ids = recorded_data_ids(variable, timestamps)
+    received = len(ids)
+    if received == 0:
+        return 0, 0, 0
+
+    # sorted ids of the first occurrence of each point
+    ids, index = np.unique(ids, return_index=True)
+    values = values[index]
+
+    written = 0
+    date_saved = now()
+    for start in range(0, len(ids), batch_size):
+        batch_ids = ids[start : start + batch_size]
+        batch_values = values[start : start + batch_size]
+        stored = np.fromiter(
+            RecordedData.objects.filter(
+                variable_id=variable.pk,
+                id__gte=int(batch_ids[0]),
+                id__lte=int(batch_ids[-1]),
+            ).values_list("id", flat=True),
+            dtype=np.int64,
+        )
+        new = ~np.isin(batch_ids, stored)
+        records = [
+            RecordedData(
+                id=int(i),
+                variable=variable,
+                value=float(v),
+                date_saved=date_saved,
+            )
+            for i, v in zip(batch_ids[new].tolist(), batch_values[new].tolist())
+        ]
+        # a point written by another process since the query is skipped
+        RecordedData.objects.bulk_create(
+            records, batch_size=batch_size, ignore_conflicts=True
+        )
+        written += len(records)
+    return received, received - written, written
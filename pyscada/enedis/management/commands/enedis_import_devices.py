@@ -0,0 +1,48 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+
+from pyscada.enedis.importer import BATCH_SIZE, import_devices, read_rows
+from pyscada.enedis.reinit import flush_reinit
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = "Create SGE Tiers devices and their variables from a CSV, JSON or JSON lines file"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "file",
+            type=str,
+            help="file with the prm, login, certificate, key, authorization, fields and name columns",
+        )
+        parser.add_argument(
+            "--format",
+            choices=["csv", "json", "jsonl"],
+            help="file format, from the file extension by default",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=BATCH_SIZE,
+            help="number of devices created by each transaction",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="check the rows without creating the devices",
+        )
+
+    def handle(self, *args, **options):
+        result = import_devices(
+            read_rows(options["file"], options["format"]),
+            batch_size=max(1, options["batch_size"]),
+            dry_run=options["dry_run"],
+            progress=lambda result: self.stdout.write(str(result)),
+        )
+        # do not wait for the reinit delay before exiting
+        flush_reinit()
+        for row, message in result.errors:
+            self.stderr.write(f"row {row} : {message}")
+        self.stdout.write(self.style.SUCCESS(str(result)))
@@ -0,0 +1,54 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+
+from pyscada.enedis.models import SGETiersDevice, SGETiersField
+from pyscada.enedis.provisioning import provision_variables
+from pyscada.enedis.reinit import flush_reinit
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = "Create the variables of the SGE Tiers fields for the SGE Tiers devices in bulk"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--device",
+            type=int,
+            action="append",
+            help="id of a device to provision, all the SGE Tiers devices by default",
+        )
+        parser.add_argument(
+            "--field",
+            type=int,
+            action="append",
+            help="id of a SGE Tiers field to create, the auto create variables of each device by default",
+        )
+        parser.add_argument(
+            "--no-reinit",
+            action="store_true",
+            help="do not reinitialize the DAQ processes",
+        )
+
+    def handle(self, *args, **options):
+        sgetiers_devices = SGETiersDevice.objects.filter(
+            sgetiers_device__isnull=False
+        ).select_related("sgetiers_device")
+        if options["device"]:
+            sgetiers_devices = sgetiers_devices.filter(
+                sgetiers_device__in=options["device"]
+            )
+        fields = None
+        if options["field"]:
+            fields = SGETiersField.objects.filter(id__in=options["field"])
+        else:
+            sgetiers_devices = sgetiers_devices.prefetch_related(
+                "auto_create_variables"
+            )
+        created, updated = provision_variables(
+            sgetiers_devices, fields, reinit=not options["no_reinit"]
+        )
+        # do not wait for the reinit delay before exiting
+        flush_reinit()
+        self.stdout.write(f"{created} variables created, {updated} updated")
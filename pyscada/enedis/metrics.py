@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from pyscada.enedis.utils import get_setting
+
+import os
+from contextlib import contextmanager
+from tempfile import NamedTemporaryFile
+from threading import Lock
+from time import perf_counter
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+PREFIX = "pyscada_enedis_"
+# seconds
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+DESCRIPTIONS = {
+    "requests_total": "SOAP requests sent by device, service and result",
+    "errors_total": "failed requests by device, service and SGT code",
+    "deferred_total": "requests deferred to a later read by device and service",
+    "cache_hits_total": "responses served by the response cache by service",
+    "response_bytes_total": "bytes received by device and service",
+    "points_extracted_total": "points found in the responses by device and service",
+    "points_written_total": "values stored by device and service",
+    "points_duplicated_total": "values not written as already stored or repeated by device and service",
+    "request_seconds": "SOAP request duration by service",
+    "parse_seconds": "response extraction and conversion duration by service",
+    "write_seconds": "recorded data bulk write duration by service",
+    "read_seconds": "device read duration",
+}
+
+
+class Metrics(object):
+    """
+    counters and histograms of the process, rendered in the Prometheus text format
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        # {(name, labels): value}
+        self._counters = {}
+        # {(name, labels): [count by bucket, sum, count]}
+        self._histograms = {}
+        self._lock = Lock()
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            if key not in self._histograms:
+                self._histograms[key] = [[0] * len(self.buckets), 0.0, 0]
+            histogram = self._histograms[key]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    histogram[0][i] += 1
+            histogram[1] += value
+            histogram[2] += 1
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """
+        observe the duration of the block
+        """
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, perf_counter() - start, **labels)
+
+    def get(self, name, **labels):
+        """
+        return the value of a counter
+        """
+        with self._lock:
+            return self._counters.get((name, tuple(sorted(labels.items()))), 0)
+
+    def reset(self):
+        with self._lock:
+            self._counters = {}
+            self._histograms = {}
+
+    def render(self, extra_labels=None):
+        """
+        return the metrics in the Prometheus text format
+        """
+        extra = tuple(sorted((extra_labels or {}).items()))
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {
+                key: (list(h[0]), h[1], h[2]) for key, h in self._histograms.items()
+            }
+        lines = []
+        for name in sorted(set(key[0] for key in counters)):
+            lines += _header(name, "counter")
+            for (n, labels), value in sorted(counters.items()):
+                if n == name:
+                    lines.append(f"{PREFIX}{name}{_labels(labels + extra)} {value}")
+        for name in sorted(set(key[0] for key in histograms)):
+            lines += _header(name, "histogram")
+            for (n, labels), (buckets, total, count) in sorted(histograms.items()):
+                if n != name:
+                    continue
+                for bound, value in zip(self.buckets, buckets):
+                    le = (("le", str(bound)),)
+                    lines.append(
+                        f"{PREFIX}{name}_bucket{_labels(labels + extra + le)} {value}"
+                    )
+                lines.append(
+                    f'{PREFIX}{name}_bucket{_labels(labels + extra + (("le", "+Inf"),))} {count}'
+                )
+                lines.append(f"{PREFIX}{name}_sum{_labels(labels + extra)} {total}")
+                lines.append(f"{PREFIX}{name}_count{_labels(labels + extra)} {count}")
+        return "\n".join(lines) + "\n"
+
+
+def _header(name, metric_type):
+    lines = []
+    if name in DESCRIPTIONS:
+        lines.append(f"# HELP {PREFIX}{name} {DESCRIPTIONS[name]}")
+    lines.append(f"# TYPE {PREFIX}{name} {metric_type}")
+    return lines
+
+
+def _labels(labels):
+    if len(labels) == 0:
+        return ""
+    escaped = (
+        (name, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for name, value in labels
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+# metrics of this process
+metrics = Metrics()
+
+
+def write_textfile(name, extra_labels=None):
+    """
+    write the metrics of the process in the metrics_dir setting folder as name.prom,
+    to be read by the node exporter textfile collector, return the file path or None
+    """
+    directory = get_setting("metrics_dir")
+    if directory is None:
+        return None
+    path = os.path.join(directory, f"{name}.prom")
+    try:
+        os.makedirs(directory, exist_ok=True)
+        with NamedTemporaryFile("w", dir=directory, suffix=".tmp", delete=False) as f:
+            f.write(metrics.render(extra_labels))
+        os.replace(f.name, path)
+    except OSError as e:
+        logger.warning(f"Cannot write the metrics in {path} : {e}")
+        return None
+    return path
@@ -0,0 +1,40 @@
+# Generated by Django 4.2.5 on 2026-10-18 09:12
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("enedis", "0003_alter_sgetiersdevice_auto_create_variables_and_more"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SGETiersCheckpoint",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("command_service_type", models.CharField(max_length=250)),
+                ("next_poll", models.DateTimeField(blank=True, null=True)),
+                ("updated", models.DateTimeField(auto_now=True)),
+                (
+                    "sgetiers_device",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="enedis.sgetiersdevice",
+                    ),
+                ),
+            ],
+            options={
+                "unique_together": {("sgetiers_device", "command_service_type")},
+            },
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 4.2.5 on 2026-10-18 10:04
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("enedis", "0004_sgetierscheckpoint"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SGETiersCoverage",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("start", models.DateField()),
+                ("end", models.DateField()),
+                (
+                    "sgetiers_variable",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="enedis.sgetiersvariable",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["sgetiers_variable", "start"],
+            },
+        ),
+    ]
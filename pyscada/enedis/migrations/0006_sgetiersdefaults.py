@@ -0,0 +1,29 @@
+# Generated by Django 4.2.5 on 2026-10-18 14:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("enedis", "0005_sgetierscoverage"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SGETiersDefaults",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=50, unique=True)),
+                ("fingerprint", models.CharField(max_length=64)),
+                ("updated", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,337 @@
+# -*- coding: utf-8 -*-
+"""
+Local stand-in of the SGE Tiers SOAP services used by the Enedis handler, for load tests.
+
+Run it with : python -m pyscada.enedis.mockserver --port 8080 --latency 0.2
+and use SGETiers(proxy_url="http://127.0.0.1:8080") or the proxy_url setting.
+"""
+from __future__ import unicode_literals
+
+import argparse
+import math
+import random
+import re
+from datetime import date, datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock, Thread
+from time import sleep
+from xml.sax.saxutils import escape
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+SOAP_ENV = "http://schemas.xmlsoap.org/soap/envelope/"
+DETAILS_NS = "http://www.enedis.fr/sge/b2b/services/consultationmesuresdetaillees/common"
+TECHNICAL_NS = (
+    "http://www.enedis.fr/sge/b2b/services/consulterdonneestechniquescontractuelles/v1.0"
+)
+
+# functional and technical errors returned at random
+FUNCTIONAL_ERRORS = [
+    ("SGT401", "Demande non recevable : point inexistant."),
+    ("SGT4L8", "Aucune mesure trouvée pour ce point."),
+]
+TECHNICAL_ERRORS = [
+    ("SGT500", "Une erreur technique est survenue."),
+    ("SGT570", "Le service est momentanément indisponible."),
+]
+QUOTA_ERROR = ("SGT589", "Le quota de demandes est atteint.")
+
+_field_re = {
+    name: re.compile(rf"<(?:[\w-]+:)?{name}>([^<]*)</".encode())
+    for name in (
+        "pointId",
+        "initiateurLogin",
+        "loginUtilisateur",
+        "mesuresTypeCode",
+        "grandeurPhysique",
+        "dateDebut",
+        "dateFin",
+    )
+}
+
+
+def _field(body, name):
+    match = _field_re[name].search(body)
+    return match.group(1).decode() if match else None
+
+
+def _envelope(content):
+    return (
+        f'<?xml version="1.0" encoding="UTF-8"?>'
+        f'<soap:Envelope xmlns:soap="{SOAP_ENV}"><soap:Body>{content}</soap:Body></soap:Envelope>'
+    ).encode()
+
+
+def fault(code, message):
+    """
+    SOAP fault in the SGE format, read by lowatt_enedis as "code: message"
+    """
+    return _envelope(
+        f"<soap:Fault><faultcode>soap:Server</faultcode><faultstring>{escape(message)}</faultstring>"
+        f'<detail><erreur><resultat code="{code}">{escape(message)}</resultat></erreur></detail>'
+        f"</soap:Fault>"
+    )
+
+
+def load_curve(prm, start, end, step_minutes=30):
+    """
+    return the (local date text, watts) of a synthetic load curve,
+    a daily and weekly profile with a noise depending on the PRM
+    """
+    rng = random.Random(f"{prm}{start}")
+    base = 500 + int(prm) % 2000 if str(prm).isdigit() else 1000
+    t = datetime.combine(start, datetime.min.time()) + timedelta(minutes=step_minutes)
+    end = datetime.combine(end, datetime.min.time())
+    points = []
+    while t <= end:
+        hour = t.hour + t.minute / 60
+        daily = 0.6 + 0.4 * math.sin((hour - 7) / 24 * 2 * math.pi)
+        weekly = 0.8 if t.weekday() >= 5 else 1.0
+        points.append(
+            (
+                t.strftime("%Y-%m-%d %H:%M:%S"),
+                max(0, int(base * daily * weekly * rng.uniform(0.85, 1.15))),
+            )
+        )
+        t += timedelta(minutes=step_minutes)
+    return points
+
+
+def daily_energy(prm, start, end):
+    """
+    return the (date text, Wh) of each day
+    """
+    return [
+        (d, sum(v for t, v in points) // 2)
+        for d, points in _by_day(load_curve(prm, start, end))
+    ]
+
+
+def _by_day(points):
+    days = {}
+    for t, v in points:
+        # a point at 00:00 closes the previous day
+        day = (datetime.strptime(t, "%Y-%m-%d %H:%M:%S") - timedelta(seconds=1)).date()
+        days.setdefault(day.isoformat(), []).append((t, v))
+    return sorted(days.items())
+
+
+def _points(points):
+    return "".join(f"<points><v>{v}</v><d>{d}</d></points>" for d, v in points)
+
+
+def details_response(prm, type_code, grandeur, start, end):
+    header = (
+        f"<pointId>{escape(prm)}</pointId><mesuresCorrigees>BRUT</mesuresCorrigees>"
+        f"<periode><dateDebut>{start}</dateDebut><dateFin>{end}</dateFin></periode>"
+    )
+    if type_code == "COURBE":
+        content = (
+            f"<grandeur><grandeurMetier>CONS</grandeurMetier><grandeurPhysique>{grandeur}</grandeurPhysique>"
+            f"<unite>W</unite>{_points(load_curve(prm, start, end))}</grandeur>"
+            f"<modeCalcul>BRUT</modeCalcul>"
+        )
+    elif type_code == "ENERGIE":
+        content = (
+            f"<grandeur><grandeurMetier>CONS</grandeurMetier><grandeurPhysique>{grandeur}</grandeurPhysique>"
+            f"<unite>Wh</unite>{_points(daily_energy(prm, start, end))}</grandeur>"
+            f"<typeValeur>ENERGIE</typeValeur><pas>P1D</pas>"
+        )
+    else:
+        classes = ""
+        for class_id, share in (("HC", 0.35), ("HP", 0.65)):
+            index = 10_000_000
+            values = ""
+            for d, v in daily_energy(prm, start, end):
+                index += int(v * share)
+                values += f"<valeur><d>{d}T00:00:00+01:00</d><v>{index}</v><iv>0</iv></valeur>"
+            classes += (
+                f"<classeTemporelle><idClasseTemporelle>{class_id}</idClasseTemporelle>"
+                f"<libelleClasseTemporelle>Heures {class_id}</libelleClasseTemporelle>"
+                f"<codeCadran>{class_id}</codeCadran>{values}</classeTemporelle>"
+            )
+        content = (
+            f"<contexte><etapeMetier>BRUT</etapeMetier><contexteReleve>COL</contexteReleve>"
+            f"<typeReleve>AQ</typeReleve><grandeur><grandeurMetier>CONS</grandeurMetier>"
+            f"<grandeurPhysique>EA</grandeurPhysique><unite>Wh</unite>"
+            f"<calendrier><idCalendrier>DI000003</idCalendrier><libelleCalendrier>HC/HP</libelleCalendrier>"
+            f"{classes}</calendrier></grandeur></contexte>"
+        )
+    return _envelope(
+        f'<ns:consulterMesuresDetailleesResponseV3 xmlns:ns="{DETAILS_NS}">'
+        f"{header}{content}</ns:consulterMesuresDetailleesResponseV3>"
+    )
+
+
+def technical_response(prm):
+    return _envelope(
+        f'<ns:consulterDonneesTechniquesContractuellesResponse xmlns:ns="{TECHNICAL_NS}">'
+        f"<point id=\"{escape(prm)}\"><donneesGenerales>"
+        f"<etatContractuel><code>SERVC</code><libelle>En service</libelle></etatContractuel>"
+        f"<adresseInstallation><batiment>A</batiment><numeroEtNomVoie>1 rue de la Gare</numeroEtNomVoie>"
+        f"<codePostal>64000</codePostal><commune><libelle>PAU</libelle></commune></adresseInstallation>"
+        f"<dateDerniereModificationFormuleTarifaireAcheminement>2020-01-01</dateDerniereModificationFormuleTarifaireAcheminement>"
+        f"<dateDerniereAugmentationPuissanceSouscrite>2019-06-01</dateDerniereAugmentationPuissanceSouscrite>"
+        f"<segment><code>C5</code><libelle>C5</libelle></segment>"
+        f"<niveauOuvertureServices>2</niveauOuvertureServices></donneesGenerales>"
+        f"<situationAlimentation><alimentationPrincipale><domaineTension><code>BTINF</code>"
+        f"<libelle>BT&lt;=36kVA</libelle></domaineTension><tensionLivraison><code>BTM</code>"
+        f"<libelle>230 V</libelle></tensionLivraison><puissanceRaccordementSoutirage>"
+        f"<valeur>12</valeur><unite>kVA</unite></puissanceRaccordementSoutirage>"
+        f"</alimentationPrincipale></situationAlimentation>"
+        f"<situationComptage><dispositifComptage><typeComptage><code>LINKY</code>"
+        f"<libelle>Compteur Linky</libelle></typeComptage><compteurs><compteur>"
+        f"<localisation><code>INT</code><libelle>Intérieur</libelle></localisation>"
+        f"<matricule>{escape(prm)[-12:]}</matricule><ticActivee>true</ticActivee>"
+        f"<ticStandard>false</ticStandard><plagesHeuresCreuses>HC (22H00-6H00)</plagesHeuresCreuses>"
+        f"</compteur></compteurs><disjoncteur><calibre><code>45</code><libelle>45 A</libelle>"
+        f"</calibre></disjoncteur><transformateurCourant><calibre><code>0</code>"
+        f"<libelle>Sans objet</libelle></calibre></transformateurCourant></dispositifComptage>"
+        f"<mediareleve><code>LNC</code><libelle>Linky communicant</libelle></mediareleve>"
+        f"<modereleve><code>TE</code><libelle>Télérelevé</libelle></modereleve></situationComptage>"
+        f"<situationContractuelle><structureTarifaire><formuleTarifaireAcheminement>"
+        f"<code>BTINFMU4</code><libelle>BTINF Moyenne Utilisation</libelle>"
+        f"</formuleTarifaireAcheminement><calendrierFrn><code>FC000012</code>"
+        f"<libelle>Heures creuses</libelle></calendrierFrn><puissanceSouscriteMax>"
+        f"<valeur>9</valeur><unite>kVA</unite></puissanceSouscriteMax></structureTarifaire>"
+        f"</situationContractuelle></point></ns:consulterDonneesTechniquesContractuellesResponse>"
+    )
+
+
+class MockSGEServer(ThreadingHTTPServer):
+    """
+    answer the technical and detailsV3 requests with synthetic data,
+    after latency seconds and with functional, technical and quota errors
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        address=("127.0.0.1", 0),
+        latency=0.0,
+        latency_jitter=0.0,
+        functional_error_rate=0.0,
+        technical_error_rate=0.0,
+        quota_per_day=None,
+        seed=None,
+    ):
+        super().__init__(address, MockSGERequestHandler)
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.functional_error_rate = functional_error_rate
+        self.technical_error_rate = technical_error_rate
+        self.quota_per_day = quota_per_day
+        self.random = random.Random(seed)
+        # {(login, day): requests}
+        self.requests_count = {}
+        self.counts = {"requests": 0, "errors": 0, "quota": 0}
+        self._lock = Lock()
+
+    @property
+    def url(self):
+        return f"http://{self.server_address[0]}:{self.server_address[1]}"
+
+    def start(self):
+        """
+        serve in a background thread, return the server
+        """
+        Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def respond(self, body):
+        """
+        return the HTTP status and the response of a SOAP request
+        """
+        with self._lock:
+            self.counts["requests"] += 1
+            draw = self.random.random()
+            delay = self.latency + self.random.uniform(0, self.latency_jitter)
+            login = _field(body, "initiateurLogin") or _field(body, "loginUtilisateur")
+            key = (login, date.today())
+            self.requests_count[key] = self.requests_count.get(key, 0) + 1
+            over_quota = (
+                self.quota_per_day is not None
+                and self.requests_count[key] > self.quota_per_day
+            )
+        if delay > 0:
+            sleep(delay)
+
+        if over_quota:
+            return self._error(QUOTA_ERROR, "quota")
+        if draw < self.functional_error_rate:
+            return self._error(self.random.choice(FUNCTIONAL_ERRORS))
+        if draw < self.functional_error_rate + self.technical_error_rate:
+            return self._error(self.random.choice(TECHNICAL_ERRORS))
+
+        prm = _field(body, "pointId") or ""
+        if b"consulterMesuresDetailleesV3" in body:
+            try:
+                start = date.fromisoformat(_field(body, "dateDebut"))
+                end = date.fromisoformat(_field(body, "dateFin"))
+            except (TypeError, ValueError):
+                return self._error(("SGT4F2", "Les dates de la demande sont invalides."))
+            return 200, details_response(
+                prm,
+                _field(body, "mesuresTypeCode"),
+                _field(body, "grandeurPhysique"),
+                start,
+                end,
+            )
+        if b"consulterDonneesTechniquesContractuelles" in body:
+            return 200, technical_response(prm)
+        return self._error(("SGT400", "Service inconnu."))
+
+    def _error(self, error, count="errors"):
+        with self._lock:
+            self.counts[count] += 1
+        return 500, fault(*error)
+
+
+class MockSGERequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        status, response = self.server.respond(body)
+        self.send_response(status)
+        self.send_header("Content-Type", "text/xml; charset=utf-8")
+        self.send_header("Content-Length", str(len(response)))
+        self.end_headers()
+        self.wfile.write(response)
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local SGE Tiers stand-in server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--latency-jitter", type=float, default=0.0)
+    parser.add_argument("--functional-error-rate", type=float, default=0.0)
+    parser.add_argument("--technical-error-rate", type=float, default=0.0)
+    parser.add_argument("--quota-per-day", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+    server = MockSGEServer(
+        (args.host, args.port),
+        latency=args.latency,
+        latency_jitter=args.latency_jitter,
+        functional_error_rate=args.functional_error_rate,
+        technical_error_rate=args.technical_error_rate,
+        quota_per_day=args.quota_per_day,
+        seed=args.seed,
+    )
+    print(f"Serving SGE Tiers stand-in on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
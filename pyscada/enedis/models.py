@@ -93,23 +93,23 @@ class SGETiersDevice(models.Model):
     def __str__(self):
         return self.sgetiers_device.short_name
 
+    @staticmethod
+    def default_polling_interval():
+        # the device is polled every hour and each command service is read
+        # when new data can exist, see pyscada.enedis.schedule
+        return 3600.0
+
     def save(self, *args, **kwargs):
         self.initialized = False
         super().save(*args, **kwargs)
-        d = None
         if self.sgetiers_device is not None:
-            if (
-                type(Device.polling_interval_choices) == tuple
-                and (86400.0, "1 Day") in Device.polling_interval_choices
-            ):
-                poll = 86400.0
-            else:
-                poll = 3600.0
-
-            # Create the Device
-            d = self.sgetiers_device
-            d.polling_interval = poll
-            d.save()
+            poll = self.default_polling_interval()
+            # update the device without sending its post_save, the DAQ processes
+            # are reinitialized once by the post_save of the SGETiersDevice
+            Device.objects.filter(pk=self.sgetiers_device_id).update(
+                polling_interval=poll
+            )
+            self.sgetiers_device.polling_interval = poll
 
     class FormSet(BaseInlineFormSet):
         def add_fields(self, form, index):
@@ -126,3 +126,50 @@ class SGETiersVariable(models.Model):
     )
     xml_path = models.TextField()
     found_in_last_request = models.BooleanField(default=False)
+
+
+class SGETiersCheckpoint(models.Model):
+    """
+    time of the next read of a command service,
+    the dates already read are in SGETiersCoverage
+    """
+
+    sgetiers_device = models.ForeignKey(SGETiersDevice, on_delete=models.CASCADE)
+    command_service_type = models.CharField(max_length=250)
+    next_poll = models.DateTimeField(null=True, blank=True)
+    updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ("sgetiers_device", "command_service_type")
+
+    def __str__(self):
+        return f"{self.sgetiers_device} {self.command_service_type} : {self.next_poll}"
+
+
+class SGETiersCoverage(models.Model):
+    """
+    [start, end) dates already read and stored for a variable
+    """
+
+    sgetiers_variable = models.ForeignKey(SGETiersVariable, on_delete=models.CASCADE)
+    start = models.DateField()
+    end = models.DateField()
+
+    class Meta:
+        ordering = ["sgetiers_variable", "start"]
+
+    def __str__(self):
+        return f"{self.sgetiers_variable.sgetiers_variable} : {self.start} - {self.end}"
+
+
+class SGETiersDefaults(models.Model):
+    """
+    fingerprint of the default rows seeded at startup
+    """
+
+    name = models.CharField(max_length=50, unique=True)
+    fingerprint = models.CharField(max_length=64)
+    updated = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} : {self.fingerprint}"
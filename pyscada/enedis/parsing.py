@@ -0,0 +1,392 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import re
+import warnings
+from datetime import datetime
+from functools import lru_cache
+from io import BytesIO
+
+import numpy as np
+from pytz import timezone
+import defusedxml.ElementTree as ET
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+_step_re = re.compile(r"^([A-Za-z_][\w.\-]*)?((?:\[[^\]]*\])*)$")
+_predicate_re = re.compile(
+    r"\[\s*(@?)([A-Za-z_][\w.\-]*)\s*(?:=\s*(['\"])(.*?)\3\s*)?\]"
+)
+
+
+class XMLPath(object):
+    """
+    subset of the ElementTree path syntax which can be matched while streaming :
+    ".//a/b", "./a/b" or "a/b" steps with [tag], [tag='text'], [@attr] or [@attr='value'] predicates
+    """
+
+    def __init__(self, xml_path, descendant, steps):
+        self.xml_path = xml_path
+        self.descendant = descendant
+        # list of (tag, [(is_attribute, name, value), ...])
+        self.steps = steps
+        # [(index from the end of the stack, predicate), ...]
+        self.predicates = [
+            (i - len(steps), predicate)
+            for i, (tag, predicates) in enumerate(steps)
+            for predicate in predicates
+        ]
+
+    @classmethod
+    def compile(cls, xml_path):
+        """
+        return the XMLPath or None if the path syntax cannot be streamed
+        """
+        path = xml_path.strip()
+        descendant = False
+        if path.startswith(".//"):
+            descendant = True
+            path = path[3:]
+        elif path.startswith("./"):
+            path = path[2:]
+        if path == "" or path.startswith("/") or "//" in path:
+            return None
+        steps = []
+        for segment in path.split("/"):
+            match = _step_re.match(segment.strip())
+            if match is None:
+                return None
+            tag, predicates_str = match.groups()
+            predicates = []
+            for predicate in re.finditer(r"\[[^\]]*\]", predicates_str):
+                p = _predicate_re.fullmatch(predicate.group(0))
+                if p is None:
+                    return None
+                predicates.append((p.group(1) == "@", p.group(2), p.group(4)))
+            if tag is None:
+                # "a/[b='c']" is the same as "a[b='c']"
+                if len(steps) == 0 or len(predicates) == 0:
+                    return None
+                steps[-1][1].extend(predicates)
+            elif tag in (".", "..", "*"):
+                return None
+            else:
+                steps.append((tag, predicates))
+        return cls(xml_path, descendant, steps)
+
+    def match(self, stack):
+        """
+        check the tags of the open elements, return the list of (element, predicate) to check
+        or None if the path does not match
+        """
+        n = len(self.steps)
+        if self.descendant:
+            if len(stack) < n + 1:
+                return None
+        elif len(stack) != n + 1:
+            return None
+        checks = []
+        for (tag, predicates), elem in zip(self.steps, stack[-n:]):
+            if elem.tag != tag:
+                return None
+            for predicate in predicates:
+                checks.append((elem, predicate))
+        return checks
+
+    def checks(self, stack):
+        """
+        return the list of (element, predicate) to check, the tags are already matched by the plan
+        """
+        return [(stack[i], predicate) for i, predicate in self.predicates]
+
+
+def _new_node():
+    # [{tag: child node}, [XMLPath ending at this node]]
+    return [{}, []]
+
+
+class PathPlan(object):
+    """
+    prefix tree of the compiled xml paths, the paths sharing their first steps
+    are matched once while reading the document
+    """
+
+    def __init__(self, xml_paths):
+        self.xml_paths = list(dict.fromkeys(xml_paths))
+        self.paths = [XMLPath.compile(xml_path) for xml_path in self.xml_paths]
+        # False if a path syntax cannot be streamed
+        self.supported = None not in self.paths
+        # paths starting from the children of the document element
+        self.root = _new_node()
+        # .// paths starting from any element below the document element
+        self.descendant = _new_node()
+        # tags of the children checked by the predicates, kept until their parent is closed
+        self.predicate_tags = set()
+        if not self.supported:
+            return
+        for path in self.paths:
+            node = self.descendant if path.descendant else self.root
+            for tag, predicates in path.steps:
+                node = node[0].setdefault(tag, _new_node())
+                self.predicate_tags.update(
+                    name for is_attribute, name, value in predicates if not is_attribute
+                )
+            node[1].append(path)
+
+    def start(self, parent_nodes, tag):
+        """
+        return the nodes reached by an element from the nodes reached by its parent
+        """
+        child = self.descendant[0].get(tag)
+        if len(parent_nodes) == 0:
+            # most of the elements
+            return () if child is None else (child,)
+        nodes = []
+        for node in parent_nodes:
+            if tag in node[0]:
+                nodes.append(node[0][tag])
+        if child is not None and all(child is not node for node in nodes):
+            nodes.append(child)
+        return nodes
+
+
+@lru_cache(maxsize=256)
+def _get_path_plan(xml_paths):
+    return PathPlan(xml_paths)
+
+
+def get_path_plan(xml_paths):
+    """
+    return the plan of the xml paths, built once for a set of paths
+    """
+    return _get_path_plan(tuple(sorted(set(xml_paths))))
+
+
+def _check_predicate(elem, predicate, closed):
+    """
+    return True or False, or None if the child needed is not parsed yet
+    """
+    is_attribute, name, value = predicate
+    if is_attribute:
+        if value is None:
+            return name in elem.attrib
+        return elem.get(name) == value
+    for child in elem:
+        if child.tag == name and (value is None or (child.text or "") == value):
+            return True
+    if closed:
+        return False
+    return None
+
+
+def _first_children_text(elem, tags):
+    if tags is None:
+        return elem.text, False
+    texts = []
+    duplicated = False
+    for tag in tags:
+        children = [child for child in elem if child.tag == tag]
+        if len(children) > 1:
+            duplicated = True
+        texts.append(children[0].text if len(children) else None)
+    return tuple(texts), duplicated
+
+
+def extract_points(response, xml_paths, fields=("d", "v")):
+    """
+    read the response once and return for each xml path the list of the text
+    of the fields children of the elements found (in document order),
+    or of the elements text if fields is None.
+    Each element is removed from the tree once closed and read to bound the memory.
+    """
+    if isinstance(response, str):
+        response = response.encode()
+    if not isinstance(response, (bytes, bytearray)):
+        raise TypeError(f"XML response expected, got {type(response)}")
+
+    plan = get_path_plan(xml_paths)
+    result = {xml_path: [] for xml_path in plan.xml_paths}
+    duplicated = {xml_path: 0 for xml_path in plan.xml_paths}
+
+    if not plan.supported:
+        # not supported by the streaming parser, use the whole document
+        root = ET.fromstring(response)
+        for xml_path in plan.xml_paths:
+            for elem in root.findall(xml_path):
+                texts, dup = _first_children_text(elem, fields)
+                result[xml_path].append(texts)
+                duplicated[xml_path] += dup
+        _log_duplicated(duplicated, fields)
+        return result
+
+    # children read from their parent once it is closed
+    kept_tags = plan.predicate_tags.union(fields or ())
+    stack = []
+    # plan nodes reached by each open element
+    nodes = []
+    # points waiting for a predicate of an ancestor : {id(elem): [(path, texts, checks), ...]}
+    pending = {}
+    for event, elem in ET.iterparse(BytesIO(response), events=("start", "end")):
+        if event == "start":
+            if len(stack) == 0:
+                # the document element, the paths start from its children
+                nodes.append([plan.root])
+            else:
+                nodes.append(plan.start(nodes[-1], elem.tag))
+            stack.append(elem)
+            continue
+
+        if pending and id(elem) in pending:
+            for path, texts, checks in pending.pop(id(elem)):
+                if all(_check_predicate(e, p, True) for e, p in checks):
+                    result[path.xml_path].append(texts)
+
+        for node in nodes.pop():
+            for path in node[1]:
+                texts, dup = _first_children_text(elem, fields)
+                if not path.predicates:
+                    duplicated[path.xml_path] += dup
+                    result[path.xml_path].append(texts)
+                    continue
+                states = [
+                    (e, p, _check_predicate(e, p, e is elem))
+                    for e, p in path.checks(stack)
+                ]
+                if any(state is False for e, p, state in states):
+                    continue
+                duplicated[path.xml_path] += dup
+                unknown = [(e, p) for e, p, state in states if state is None]
+                if len(unknown):
+                    # wait for the outermost element to be closed to check the predicates
+                    pending.setdefault(id(unknown[0][0]), []).append(
+                        (path, texts, unknown)
+                    )
+                else:
+                    result[path.xml_path].append(texts)
+
+        stack.pop()
+        # the children of a closed element are not needed anymore, the element
+        # is kept without them only if its parent reads it as a field or predicate
+        if len(elem):
+            del elem[:]
+        if elem.tag not in kept_tags and len(stack):
+            stack[-1].remove(elem)
+
+    _log_duplicated(duplicated, fields)
+    return result
+
+
+def _log_duplicated(duplicated, fields):
+    if fields is None:
+        return
+    for xml_path, count in duplicated.items():
+        if count:
+            logger.warning(
+                f"more than one {' or '.join(fields)} found in {count} elements of {xml_path}"
+            )
+
+
+def text_to_float(texts):
+    """
+    convert the texts to a float64 array in one pass, return the values and the mask of the valid ones
+    """
+    try:
+        values = np.array(texts, dtype=np.float64)
+        return values, np.ones(len(values), dtype=bool)
+    except (ValueError, TypeError):
+        pass
+    values = np.full(len(texts), np.nan)
+    valid = np.ones(len(texts), dtype=bool)
+    for i, text in enumerate(texts):
+        try:
+            values[i] = float(text)
+        except (ValueError, TypeError):
+            valid[i] = False
+    return values, valid
+
+
+_epoch = datetime(1970, 1, 1)
+
+
+def _utc_offsets(tz):
+    """
+    return the UTC transition times (epoch seconds) and the UTC offsets (seconds) of a pytz timezone
+    """
+    if not hasattr(tz, "_utc_transition_times"):
+        offset = tz.utcoffset(_epoch).total_seconds()
+        return np.array([-np.inf]), np.array([offset])
+    transitions = np.array(
+        [(t - _epoch).total_seconds() for t in tz._utc_transition_times]
+    )
+    transitions[0] = -np.inf
+    offsets = np.array([info[0].total_seconds() for info in tz._transition_info])
+    return transitions, offsets
+
+
+def local_to_utc_timestamps(dates, tz_name="Europe/Paris"):
+    """
+    convert ISO dates in local time to UTC timestamps in one pass.
+    Return the float64 timestamps and the mask of the valid dates.
+    When the local time is repeated at the end of the daylight saving time,
+    the first occurrence in dates is the summer time and the next ones the winter time.
+    A local time skipped at the start of the daylight saving time uses the winter offset.
+    Dates with an UTC offset are converted using it.
+    """
+    n = len(dates)
+    # seconds since epoch of the local time, or of the UTC time for the aware dates
+    seconds = np.zeros(n, dtype=np.float64)
+    valid = np.ones(n, dtype=bool)
+    naive = np.ones(n, dtype=bool)
+    try:
+        with warnings.catch_warnings():
+            # numpy warns for timezone aware dates
+            warnings.simplefilter("error")
+            seconds[:] = np.array(dates, dtype="datetime64[s]").astype(np.int64)
+    except (ValueError, TypeError, DeprecationWarning, UserWarning):
+        for i, d in enumerate(dates):
+            try:
+                d = datetime.fromisoformat(d)
+            except (ValueError, TypeError):
+                valid[i] = False
+                continue
+            if d.tzinfo is None:
+                seconds[i] = (d - _epoch).total_seconds()
+            else:
+                naive[i] = False
+                seconds[i] = d.timestamp()
+
+    transitions, offsets = _utc_offsets(timezone(tz_name))
+    transitions = np.append(transitions, np.inf)
+    last = len(offsets) - 1
+
+    # offset interval of the earliest possible UTC time
+    first = np.searchsorted(transitions, seconds - offsets.max(), side="right") - 1
+    first = np.clip(first, 0, last)
+
+    # a local time can exist in the first interval or in the next ones
+    timestamps = seconds - offsets[first]
+    second = np.full(n, np.nan)
+    found = np.zeros(n, dtype=bool)
+    ambiguous = np.zeros(n, dtype=bool)
+    for shift in range(3):
+        k = np.clip(first + shift, 0, last)
+        utc = seconds - offsets[k]
+        ok = (first + shift <= last) & (transitions[k] <= utc) & (utc < transitions[k + 1])
+        second = np.where(ok & found & ~ambiguous, utc, second)
+        ambiguous |= ok & found
+        timestamps = np.where(ok & ~found, utc, timestamps)
+        found |= ok
+
+    ambiguous &= naive & valid
+    if ambiguous.any():
+        index = np.nonzero(ambiguous)[0]
+        _, first_index = np.unique(seconds[index], return_index=True)
+        repeated = np.ones(len(index), dtype=bool)
+        repeated[first_index] = False
+        timestamps[index[repeated]] = second[index[repeated]]
+
+    timestamps = np.where(naive, timestamps, seconds)
+    timestamps[~valid] = np.nan
+    return timestamps, valid
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from pyscada.models import Variable
+from pyscada.enedis.models import SGETiersVariable
+from pyscada.enedis.reinit import schedule_reinit
+
+from django.db import transaction
+
+from slugify import slugify
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+# max number of rows or parameters of each query
+BATCH_SIZE = 500
+
+
+def _chunks(items, size=BATCH_SIZE):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
+
+
+def variable_name(sgetiers_device, field):
+    """
+    name of the variable created for a SGETiersField of a device
+    """
+    return slugify(f"{sgetiers_device.sgetiers_device} {field.label}")
+
+
+def provision_variables(sgetiers_devices, fields=None, reinit=True):
+    """
+    create or update the Variable and SGETiersVariable of each field for each device
+    with a few bulk queries instead of saving them one by one.
+    The fields are the auto_create_variables of each device if fields is None.
+    The DAQ processes are reinitialized once at the end if reinit is True.
+    Return the numbers of variables created and updated
+    """
+    if fields is not None:
+        fields = list(fields)
+    # {name: (device, field)}
+    wanted = {}
+    for sgetiers_device in sgetiers_devices:
+        if sgetiers_device.sgetiers_device_id is None:
+            continue
+        device_fields = fields
+        if device_fields is None:
+            device_fields = sgetiers_device.auto_create_variables.all()
+        for field in device_fields:
+            wanted[variable_name(sgetiers_device, field)] = (
+                sgetiers_device.sgetiers_device,
+                field,
+            )
+    if len(wanted) == 0:
+        return 0, 0
+
+    updated = set()
+    with transaction.atomic():
+        variables = {}
+        for names in _chunks(wanted):
+            for var in Variable.objects.filter(name__in=names):
+                variables[var.name] = var
+        to_create = []
+        to_update = []
+        conflicts = []
+        for name, (device, field) in wanted.items():
+            var = variables.get(name)
+            if var is None:
+                to_create.append(
+                    Variable(
+                        device=device,
+                        name=name,
+                        cov_increment=-1,
+                        description=field.label,
+                        unit_id=field.unit_id,
+                    )
+                )
+            elif var.device_id != device.pk:
+                conflicts.append(name)
+            elif (var.cov_increment, var.description, var.unit_id) != (
+                -1,
+                field.label,
+                field.unit_id,
+            ):
+                var.cov_increment = -1
+                var.description = field.label
+                var.unit_id = field.unit_id
+                to_update.append(var)
+                updated.add(name)
+        for name in conflicts:
+            logger.warning(f"Variable {name} already exists for another device")
+            del wanted[name]
+        Variable.objects.bulk_create(to_create, batch_size=BATCH_SIZE)
+        Variable.objects.bulk_update(
+            to_update, ["cov_increment", "description", "unit"], batch_size=BATCH_SIZE
+        )
+
+        # the pk of the created variables are not set by all the databases
+        variables_ids = {}
+        for names in _chunks(wanted):
+            variables_ids.update(
+                Variable.objects.filter(name__in=names).values_list("name", "pk")
+            )
+        sgetiers_variables = {}
+        for ids in _chunks(variables_ids.values()):
+            for sge_var in SGETiersVariable.objects.filter(
+                sgetiers_variable_id__in=ids
+            ):
+                sgetiers_variables[sge_var.sgetiers_variable_id] = sge_var
+        sge_to_create = []
+        sge_to_update = []
+        for name, (device, field) in wanted.items():
+            sge_var = sgetiers_variables.get(variables_ids[name])
+            if sge_var is None:
+                sge_to_create.append(
+                    SGETiersVariable(
+                        sgetiers_variable_id=variables_ids[name],
+                        command_service_type=field.command_service_type,
+                        xml_path=field.xml_path,
+                    )
+                )
+            elif (sge_var.command_service_type, sge_var.xml_path) != (
+                field.command_service_type,
+                field.xml_path,
+            ):
+                sge_var.command_service_type = field.command_service_type
+                sge_var.xml_path = field.xml_path
+                sge_to_update.append(sge_var)
+                updated.add(name)
+        SGETiersVariable.objects.bulk_create(sge_to_create, batch_size=BATCH_SIZE)
+        SGETiersVariable.objects.bulk_update(
+            sge_to_update,
+            ["command_service_type", "xml_path"],
+            batch_size=BATCH_SIZE,
+        )
+
+    logger.debug(
+        f"Auto created {len(to_create)} and updated {len(updated)} SGETiers variables"
+    )
+    if reinit and (len(to_create) or len(updated) or len(sge_to_create)):
+        devices = {device.pk: device for device, field in wanted.values()}
+        schedule_reinit(devices.values())
+    return len(to_create), len(updated)
@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from pyscada.enedis.utils import get_setting
+
+import fcntl
+import json
+import os
+from datetime import date
+from threading import Lock
+from time import sleep, time
+
+from slugify import slugify
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+_limiters = {}
+_limiters_lock = Lock()
+
+
+class QuotaExceeded(Exception):
+    """
+    the request was not sent to avoid exceeding the Enedis quota
+    """
+
+    def __init__(self, key, message="local daily quota reached"):
+        super().__init__(key, message)
+        self.key = key
+        self.code = "SGT589"
+        self.message = message
+
+    def __str__(self):
+        return f"{self.code}: {self.message} for {self.key}"
+
+
+class RateLimiter(object):
+    """
+    token bucket with a daily max number of requests,
+    shared with the other processes when a state file is given
+    """
+
+    def __init__(self, key, per_second=5.0, burst=5, per_day=None, state_file=None):
+        self.key = key
+        self.per_second = float(per_second)
+        self.burst = max(1.0, float(burst))
+        self.per_day = per_day
+        self.state_file = state_file
+        self._lock = Lock()
+        self._state = {
+            "tokens": self.burst,
+            "updated": time(),
+            "day": date.today().isoformat(),
+            "day_count": 0,
+        }
+
+    def _load(self, f):
+        try:
+            f.seek(0)
+            self._state.update(json.loads(f.read() or "{}"))
+        except ValueError:
+            logger.warning(f"Invalid rate limit state file {self.state_file}")
+
+    def _save(self, f):
+        f.seek(0)
+        f.truncate()
+        f.write(json.dumps(self._state))
+        f.flush()
+
+    def _take(self):
+        """
+        return 0 if a token was taken, the seconds to wait for the next one, or None if the daily quota is reached
+        """
+        now = time()
+        today = date.today().isoformat()
+        if self._state["day"] != today:
+            self._state["day"] = today
+            self._state["day_count"] = 0
+        if self.per_day is not None and self._state["day_count"] >= self.per_day:
+            return None
+        self._state["tokens"] = min(
+            self.burst,
+            self._state["tokens"]
+            + max(0.0, now - self._state["updated"]) * self.per_second,
+        )
+        self._state["updated"] = now
+        if self._state["tokens"] >= 1:
+            self._state["tokens"] -= 1
+            self._state["day_count"] += 1
+            return 0
+        return (1 - self._state["tokens"]) / self.per_second
+
+    def _take_locked(self):
+        with self._lock:
+            if self.state_file is None:
+                return self._take()
+            with open(self.state_file, "a+") as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    self._load(f)
+                    wait = self._take()
+                    self._save(f)
+                finally:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+            return wait
+
+    def acquire(self, timeout=None):
+        """
+        wait for a token, return False if the timeout is exceeded
+        raise QuotaExceeded if the daily quota is reached
+        """
+        start = time()
+        while True:
+            wait = self._take_locked()
+            if wait is None:
+                raise QuotaExceeded(self.key)
+            if wait == 0:
+                return True
+            if timeout is not None and time() - start + wait > timeout:
+                return False
+            sleep(wait)
+
+
+def get_rate_limiter(key):
+    """
+    return the limiter of the contract or login, configured by the rate_limits setting
+    """
+    with _limiters_lock:
+        if key not in _limiters:
+            rate_limits = get_setting("rate_limits")
+            config = dict(rate_limits.get("default", {}))
+            config.update(rate_limits.get(key, {}))
+            state_file = None
+            state_dir = get_setting("rate_limit_state_dir")
+            if state_dir is not None:
+                os.makedirs(state_dir, exist_ok=True)
+                state_file = os.path.join(state_dir, f"{slugify(str(key))}.json")
+            _limiters[key] = RateLimiter(key, state_file=state_file, **config)
+        return _limiters[key]
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from pyscada.models import Device
+from pyscada.enedis.utils import get_setting
+
+import atexit
+from threading import Lock, Timer
+
+from django.db import connection, transaction
+from django.db.models.signals import post_save
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+# {device pk: device} changed since the last reinit
+_pending = {}
+_timer = None
+_lock = Lock()
+
+
+def schedule_reinit(devices):
+    """
+    reinitialize the DAQ processes of the devices once the transaction is committed
+    and no other device changed during reinit_delay seconds
+    """
+    devices = [device for device in devices if device is not None]
+    if len(devices):
+        transaction.on_commit(lambda: _add(devices))
+
+
+def _add(devices):
+    global _timer
+    delay = float(get_setting("reinit_delay"))
+    with _lock:
+        for device in devices:
+            _pending[device.pk] = device
+        if _timer is not None:
+            _timer.cancel()
+        _timer = None
+        if delay > 0:
+            _timer = Timer(delay, _flush_in_timer)
+            _timer.daemon = True
+            _timer.start()
+    if delay <= 0:
+        flush_reinit()
+
+
+def _flush_in_timer():
+    try:
+        flush_reinit()
+    finally:
+        # the timer thread has its own database connection
+        connection.close()
+
+
+def flush_reinit():
+    """
+    send the reinit of the devices changed now.
+    The shard processes are not labelled by device : the post_save of a device
+    restarts the parent process of its protocol and all its shards,
+    so one post_save is sent for each protocol.
+    """
+    global _timer
+    with _lock:
+        if _timer is not None:
+            _timer.cancel()
+            _timer = None
+        devices = list(_pending.values())
+        _pending.clear()
+    protocols = {}
+    for device in devices:
+        protocols.setdefault(device.protocol_id, device)
+    if len(devices):
+        logger.debug(f"Reinit the DAQ processes for {len(devices)} devices changed")
+    for device in protocols.values():
+        post_save.send_robust(sender=Device, instance=device)
+
+
+# a management command or a worker can exit before the timer
+atexit.register(flush_reinit)
@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from pyscada.enedis.utils import get_setting
+
+import os
+import re
+from datetime import date, timedelta
+from threading import Lock
+
+from slugify import slugify
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+RECORD = "record"
+REPLAY = "replay"
+
+_date_re = re.compile(rb"(\d{4})-(\d{2})-(\d{2})")
+
+_fixtures = {}
+_fixtures_lock = Lock()
+
+
+class FixtureNotFound(Exception):
+    """
+    no response recorded for the service, type and courbe type requested
+    """
+
+
+class Fixtures(object):
+    """
+    SOAP responses recorded in a folder by service, type and courbe type.
+    A response is replayed for the same request, or for another PRM or date window
+    by replacing the PRM and shifting the dates of a response of the same type.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        # {group folder: [(prm, from, to, path), ...]}
+        self._index = {}
+        self._lock = Lock()
+
+    def _group(self, service, input_dict):
+        name = "-".join(
+            [service]
+            + [
+                str(input_dict[field])
+                for field in ("type", "courbe_type")
+                if input_dict.get(field)
+            ]
+        )
+        return os.path.join(self.directory, slugify(name))
+
+    def record(self, service, input_dict, response):
+        """
+        save a response of the service
+        """
+        if not isinstance(response, (bytes, bytearray)):
+            return False
+        group = self._group(service, input_dict)
+        os.makedirs(group, exist_ok=True)
+        name = f"{input_dict.get('prm', '')}_{input_dict.get('from', '')}_{input_dict.get('to', '')}.xml"
+        with open(os.path.join(group, name), "wb") as f:
+            f.write(response)
+        with self._lock:
+            self._index.pop(group, None)
+        return True
+
+    def _fixtures(self, group):
+        with self._lock:
+            if group not in self._index:
+                fixtures = []
+                if os.path.isdir(group):
+                    for name in sorted(os.listdir(group)):
+                        if not name.endswith(".xml"):
+                            continue
+                        prm, t_from, t_to = (name[:-4].split("_") + ["", ""])[:3]
+                        with open(os.path.join(group, name), "rb") as f:
+                            fixtures.append((prm, t_from, t_to, f.read()))
+                self._index[group] = fixtures
+            return self._index[group]
+
+    def replay(self, service, input_dict):
+        """
+        return the response recorded for the request, or one of the same type
+        for the PRM and shifted to the window requested
+        """
+        group = self._group(service, input_dict)
+        fixtures = self._fixtures(group)
+        if len(fixtures) == 0:
+            raise FixtureNotFound(f"no response recorded in {group}")
+        prm = str(input_dict.get("prm", ""))
+        t_from = str(input_dict.get("from", ""))
+        t_to = str(input_dict.get("to", ""))
+        for fixture in fixtures:
+            if fixture[:3] == (prm, t_from, t_to):
+                return fixture[3]
+
+        # the recorded window the closest to the length requested
+        fixture = fixtures[0]
+        try:
+            length = date.fromisoformat(t_to) - date.fromisoformat(t_from)
+            fixture = min(
+                fixtures,
+                key=lambda f: abs(
+                    date.fromisoformat(f[2]) - date.fromisoformat(f[1]) - length
+                ),
+            )
+            shift = date.fromisoformat(t_from) - date.fromisoformat(fixture[1])
+        except ValueError:
+            shift = timedelta(0)
+        response = fixture[3]
+        if fixture[0] != "" and prm != "":
+            response = response.replace(fixture[0].encode(), prm.encode())
+        if shift:
+            response = shift_dates(response, shift)
+        return response
+
+
+def shift_dates(response, shift):
+    """
+    shift the ISO dates of the response
+    """
+    shifted = {}
+
+    def replace(match):
+        text = match.group(0)
+        if text not in shifted:
+            try:
+                shifted[text] = (
+                    (date.fromisoformat(text.decode()) + shift).isoformat().encode()
+                )
+            except ValueError:
+                shifted[text] = text
+        return shifted[text]
+
+    return _date_re.sub(replace, response)
+
+
+def get_fixtures():
+    """
+    return the mode (record or replay) and the fixtures of the replay settings,
+    or (None, None) if they are not set
+    """
+    mode = get_setting("replay_mode")
+    directory = get_setting("replay_dir")
+    if mode not in (RECORD, REPLAY) or directory is None:
+        return None, None
+    with _fixtures_lock:
+        if directory not in _fixtures:
+            _fixtures[directory] = Fixtures(directory)
+        return mode, _fixtures[directory]
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import re
+from random import uniform
+from threading import Lock
+from time import time
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+# SGT4xx : the request is refused, it will fail again
+FUNCTIONAL = "functional"
+# SGT5xx : error on the Enedis side, retry later
+TECHNICAL = "technical"
+# SGT589 : quota exceeded, retry when the quota is available again
+QUOTA = "quota"
+# network, parsing or unknown error, retry later
+UNKNOWN = "unknown"
+
+# the SGT codes can have letters : SGT4L8, SGT4F2...
+_sgt_code_re = re.compile(r"SGT[0-9A-Z]{3}")
+# category of the codes known, the others are classified by their first digit
+ERROR_CATEGORIES = {
+    "SGT400": FUNCTIONAL,
+    "SGT401": FUNCTIONAL,
+    "SGT4F2": FUNCTIONAL,
+    "SGT4L8": FUNCTIONAL,
+    "SGT500": TECHNICAL,
+    "SGT570": TECHNICAL,
+    "SGT589": QUOTA,
+}
+
+
+def get_error_code(error):
+    """
+    return the first SGT error code found in the error or None
+    """
+    code = _sgt_code_re.search(str(error))
+    if code is None:
+        return None
+    return code.group(0)
+
+
+def classify_error(error):
+    """
+    return the error category from its SGT code
+    """
+    code = get_error_code(error)
+    if code is None:
+        return UNKNOWN
+    if code in ERROR_CATEGORIES:
+        return ERROR_CATEGORIES[code]
+    if code.startswith("SGT4"):
+        return FUNCTIONAL
+    if code.startswith("SGT5"):
+        return TECHNICAL
+    return UNKNOWN
+
+
+def backoff_delay(attempt, base_delay, max_delay):
+    """
+    exponential delay for the attempt (starting at 1) with a random jitter on its second half
+    """
+    delay = min(max_delay, base_delay * 2 ** max(0, attempt - 1))
+    return delay / 2 + uniform(0, delay / 2)
+
+
+class RetryScheduler(object):
+    """
+    keep the requests which failed with the time they can be retried,
+    the requests are retried by a later read instead of waiting
+    """
+
+    def __init__(
+        self, max_attempts=10, base_delay=60.0, max_delay=21600.0, quota_delay=3600.0
+    ):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.quota_delay = quota_delay
+        self._attempts = {}
+        self._next_try = {}
+        self._lock = Lock()
+
+    def defer(self, key, category=UNKNOWN, count=True):
+        """
+        schedule the next try of a request, return its time or None if there is no more attempts
+        count=False defers a request which was not sent
+        """
+        with self._lock:
+            attempt = self._attempts.get(key, 0) + (1 if count else 0)
+            if category == FUNCTIONAL or attempt >= self.max_attempts:
+                self._attempts.pop(key, None)
+                self._next_try.pop(key, None)
+                return None
+            delay = backoff_delay(max(1, attempt), self.base_delay, self.max_delay)
+            if category == QUOTA:
+                delay = max(delay, self.quota_delay)
+            self._attempts[key] = attempt
+            self._next_try[key] = time() + delay
+            return self._next_try[key]
+
+    def done(self, key):
+        with self._lock:
+            self._attempts.pop(key, None)
+            self._next_try.pop(key, None)
+
+    def due(self, now=None):
+        """
+        return the keys which can be retried now
+        """
+        if now is None:
+            now = time()
+        with self._lock:
+            return sorted(key for key, t in self._next_try.items() if t <= now)
+
+    def keys(self):
+        """
+        return the deferred keys
+        """
+        with self._lock:
+            return sorted(self._next_try)
+
+    def next_try(self):
+        """
+        return the time of the next retry or None
+        """
+        with self._lock:
+            if len(self._next_try) == 0:
+                return None
+            return min(self._next_try.values())
+
+    def __contains__(self, key):
+        return key in self._next_try
+
+    def __len__(self):
+        return len(self._next_try)
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from pyscada.enedis.utils import get_setting
+
+import hashlib
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+from pytz import timezone as pytz_timezone
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+# the detailsV3 data of a day is published by Enedis the next day
+PUBLICATION_TIMEZONE = "Europe/Paris"
+
+
+def get_service_kind(command_service):
+    """
+    return the key of the command service in the service_intervals setting :
+    technical, COURBE, ENERGIE or INDEX
+    """
+    parts = command_service.split("-")
+    if len(parts) > 1:
+        return parts[1]
+    return parts[0]
+
+
+def get_interval(command_service):
+    """
+    return the seconds between two reads of the command service
+    """
+    intervals = get_setting("service_intervals")
+    return float(intervals.get(get_service_kind(command_service), 86400.0))
+
+
+def get_jitter(device_id, command_service):
+    """
+    return the seconds added to the reads of the device, the same for each read of a device
+    and spread across the fleet to not send all the requests at the publication time
+    """
+    max_jitter = float(get_setting("schedule_jitter"))
+    digest = hashlib.sha256(f"{device_id}-{command_service}".encode()).digest()
+    return int.from_bytes(digest[:4], "big") / 2**32 * max_jitter
+
+
+def next_poll(command_service, device_id, complete=True, now=None):
+    """
+    return the time of the next read of the command service for the device.
+    The technical data is read again after its interval.
+    Once all the days up to yesterday are read, the detailsV3 data is read again
+    at the first publication time after the interval minus one day,
+    otherwise at the next poll of the device to read the days missing.
+    """
+    if now is None:
+        now = timezone.now()
+    interval = get_interval(command_service)
+    jitter = get_jitter(device_id, command_service)
+    if get_service_kind(command_service) == "technical":
+        return now + timedelta(seconds=interval + jitter)
+    if not complete:
+        return now
+
+    tz = pytz_timezone(PUBLICATION_TIMEZONE)
+    earliest = (now + timedelta(seconds=max(0.0, interval - 86400.0))).astimezone(tz)
+    publication_time = time(hour=int(get_setting("publication_hour")))
+    publication = tz.localize(datetime.combine(earliest.date(), publication_time))
+    if publication <= earliest:
+        publication = tz.localize(
+            datetime.combine(earliest.date() + timedelta(days=1), publication_time)
+        )
+    return publication + timedelta(seconds=jitter)
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from pyscada.enedis.utils import get_setting
+
+from django.db import connection
+
+from concurrent.futures import ThreadPoolExecutor
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def group_by_credentials(handlers):
+    """
+    return {(login, certificate, key): [handler, ...]}
+    """
+    groups = {}
+    for handler in handlers:
+        sgetiers_device = handler._device.sgetiersdevice
+        key = (
+            sgetiers_device.login,
+            sgetiers_device.certificat,
+            sgetiers_device.private_key,
+        )
+        groups.setdefault(key, []).append(handler)
+    return groups
+
+
+def _prefetch(handler):
+    try:
+        handler.prefetch_technical()
+    except Exception:
+        logger.warning(
+            f"Technical data prefetch failed for {handler._device}", exc_info=True
+        )
+    finally:
+        connection.close()
+
+
+def collect_technical(handlers, max_workers=None):
+    """
+    request the technical data of the handlers before their read.
+    The handlers sharing a login, certificate and key use the same SOAP client,
+    built once for the group before the requests are sent at the same time.
+    Each handler then reads its variables from its own response.
+    There is no multi PRM technical request, so one request is still sent for each PRM.
+    """
+    handlers = [handler for handler in handlers if handler.needs_technical()]
+    if len(handlers) == 0:
+        return 0
+    if max_workers is None:
+        max_workers = int(get_setting("worker_threads"))
+    groups = group_by_credentials(handlers)
+    for (login, certificate, key), group in groups.items():
+        handler = group[0]
+        try:
+            # built by the handler to use the same client arguments as the reads
+            # and find the client in the cache
+            if handler.inst is not None or handler.connect():
+                handler.inst.set_client(command_service="technical")
+        except Exception as e:
+            logger.warning(f"Cannot create the technical client of {login} : {e}")
+        logger.info(f"Requesting the technical data of {len(group)} PRM for {login}")
+    with ThreadPoolExecutor(
+        max_workers=max(1, min(max_workers, len(handlers))),
+        thread_name_prefix="sgetiers-technical",
+    ) as executor:
+        # group after group to reuse the connections of each client
+        list(executor.map(_prefetch, [h for group in groups.values() for h in group]))
+    return len(handlers)
+
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import tempfile
+import unittest
+from datetime import date, timedelta
+
+from pyscada.enedis import benchmarks
+from pyscada.enedis.benchmarks import load_payloads
+from pyscada.enedis.mockserver import details_response, technical_response
+from pyscada.enedis.replay import Fixtures
+
+PRM = "12345678901234"
+START = date(2023, 1, 2)
+
+
+class LoadPayloadsTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.fixtures = Fixtures(self.directory.name)
+        self.responses = {}
+        for days in (1, 2, 7, 31):
+            input_dict = {
+                "prm": PRM,
+                "type": "COURBE",
+                "courbe_type": "PA",
+                "from": START.isoformat(),
+                "to": (START + timedelta(days)).isoformat(),
+            }
+            self.responses[days] = details_response(
+                PRM, "COURBE", "PA", START, START + timedelta(days)
+            )
+            self.fixtures.record("detailsV3", input_dict, self.responses[days])
+        self.fixtures.record("technical", {"prm": PRM}, technical_response(PRM))
+
+    def test_recorded_sizes(self):
+        with self.assertLogs(benchmarks.logger, "WARNING"):
+            payloads = load_payloads(None, self.directory.name)
+        # the largest response of each size, the technical response has no window
+        self.assertEqual(
+            payloads,
+            {
+                "1d": self.responses[2],
+                "7d": self.responses[7],
+                "1m": self.responses[31],
+            },
+        )
+        payloads = load_payloads(["7d", "1m"], self.directory.name)
+        self.assertEqual(list(payloads), ["7d", "1m"])
+
+    def test_no_recorded_response(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with self.assertLogs(benchmarks.logger, "WARNING"):
+                payloads = load_payloads(["1d"], directory)
+        self.assertEqual(list(payloads), ["1d"])
@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import os
+import tempfile
+import unittest
+import zlib
+from datetime import date, timedelta
+from time import time
+from unittest import mock
+
+from pyscada.enedis import cache
+from pyscada.enedis.cache import ResponseCache, get_response_cache
+from pyscada.enedis.mockserver import details_response
+
+PRM = "12345678901234"
+TTLS = [[2, 0], [35, 86400], [None, None]]
+
+
+def request(days_ago, prm=PRM):
+    """
+    return the input of a detailsV3 request of a 7 days window ending days_ago
+    """
+    end = date.today() - timedelta(days_ago)
+    return {
+        "prm": prm,
+        "type": "COURBE",
+        "courbe_type": "PA",
+        "from": (end - timedelta(7)).isoformat(),
+        "to": end.isoformat(),
+        "corrigee": False,
+    }
+
+
+class ResponseCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.cache = ResponseCache(self.directory.name, ttls=TTLS)
+
+    def response(self, input_dict):
+        return details_response(
+            input_dict["prm"],
+            "COURBE",
+            "PA",
+            date.fromisoformat(input_dict["from"]),
+            date.fromisoformat(input_dict["to"]),
+        )
+
+    def put(self, input_dict):
+        response = self.response(input_dict)
+        self.assertTrue(self.cache.put("detailsV3", input_dict, response))
+        return response
+
+    def path(self, input_dict):
+        return self.cache._path(self.cache.key("detailsV3", input_dict))
+
+    def set_time(self, input_dict, seconds_ago):
+        t = time() - seconds_ago
+        os.utime(self.path(input_dict), (t, t))
+
+    def test_zlib_round_trip(self):
+        input_dict = request(10)
+        response = self.put(input_dict)
+        self.assertEqual(self.cache.get("detailsV3", input_dict), response)
+        with open(self.path(input_dict), "rb") as f:
+            data = f.read()
+        self.assertEqual(zlib.decompress(data), response)
+        self.assertLess(len(data), len(response) / 4)
+        # another window is another response
+        self.assertIsNone(self.cache.get("detailsV3", request(11)))
+        self.assertIsNone(self.cache.get("detailsV3", dict(input_dict, corrigee=True)))
+
+    def test_corrupted_file(self):
+        input_dict = request(10)
+        self.put(input_dict)
+        with open(self.path(input_dict), "wb") as f:
+            f.write(b"not compressed")
+        with self.assertLogs(cache.logger, "WARNING"):
+            self.assertIsNone(self.cache.get("detailsV3", input_dict))
+        self.assertFalse(os.path.exists(self.path(input_dict)))
+
+    def test_ttl(self):
+        self.assertEqual(self.cache.ttl(request(0)), 0)
+        self.assertEqual(self.cache.ttl(request(1)), 0)
+        self.assertEqual(self.cache.ttl(request(2)), 86400)
+        self.assertEqual(self.cache.ttl(request(34)), 86400)
+        self.assertIsNone(self.cache.ttl(request(35)))
+        self.assertEqual(self.cache.ttl({"to": "not a date"}), 0)
+        # the windows older than the last age are not stored
+        response_cache = ResponseCache(self.directory.name, ttls=[[2, None]])
+        self.assertEqual(response_cache.ttl(request(5)), 0)
+
+    def test_ttl_expiry(self):
+        # the responses of the last days can still change : not stored
+        self.assertFalse(
+            self.cache.put("detailsV3", request(1), self.response(request(1)))
+        )
+        self.assertFalse(os.path.exists(self.path(request(1))))
+        recent, old = request(10), request(100)
+        self.put(recent)
+        self.put(old)
+        self.set_time(recent, 86400 - 60)
+        self.assertIsNotNone(self.cache.get("detailsV3", recent))
+        self.set_time(recent, 86400 + 60)
+        self.assertIsNone(self.cache.get("detailsV3", recent))
+        self.assertFalse(os.path.exists(self.path(recent)))
+        # the old windows are kept until evicted
+        self.set_time(old, 1000 * 86400)
+        self.assertIsNotNone(self.cache.get("detailsV3", old))
+
+    def test_size_eviction(self):
+        input_dicts = [request(100, prm=f"{PRM[:-2]}{i:02d}") for i in range(10)]
+        for input_dict in input_dicts:
+            self.put(input_dict)
+        sizes = [os.path.getsize(self.path(d)) for d in input_dicts]
+        # the first responses are the least recently used except the second one
+        for i, input_dict in enumerate(input_dicts):
+            self.set_time(input_dict, 100 - i)
+        self.cache.get("detailsV3", input_dicts[1])
+
+        # removing the first response is not enough to go down to 90 % of the max size
+        self.cache.max_size = int((sum(sizes) - sizes[0] - sizes[2]) / 0.9) + 1
+        self.cache.evict()
+        kept = [os.path.exists(self.path(d)) for d in input_dicts]
+        self.assertEqual(kept, [False, True, False] + [True] * 7)
+        self.assertLessEqual(self.cache._size, self.cache.max_size * 0.9)
+
+        # put evicts once the size counted exceeds the max size
+        self.cache.max_size = self.cache._size + 1
+        self.put(request(100, prm=f"{PRM[:-2]}99"))
+        self.assertFalse(os.path.exists(self.path(input_dicts[3])))
+        self.assertTrue(os.path.exists(self.path(input_dicts[1])))
+        self.assertLessEqual(self.cache._size, self.cache.max_size)
+
+    def test_get_response_cache(self):
+        settings = {
+            "response_cache_dir": self.directory.name,
+            "response_cache_max_size": 1024,
+            "response_cache_ttls": TTLS,
+        }
+        with mock.patch.object(
+            cache, "get_setting", side_effect=settings.get
+        ), mock.patch.dict(cache._caches, clear=True):
+            response_cache = get_response_cache()
+            self.assertIs(get_response_cache(), response_cache)
+            self.assertEqual(response_cache.max_size, 1024)
+            settings["response_cache_dir"] = None
+            self.assertIsNone(get_response_cache())
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+import lowatt_enedis
+import lowatt_enedis.services
+
+from pyscada.enedis.clients import clear_clients, get_client
+from pyscada.enedis.mockserver import MockSGEServer
+
+LOGIN = "login@example.com"
+
+
+class GetClientTest(unittest.TestCase):
+    def setUp(self):
+        clear_clients()
+        self.server = MockSGEServer(latency=0.02).start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        clear_clients()
+
+    def get_client(self):
+        return get_client(
+            "technical", "cert.pem", "key.pem", proxy_url=self.server.url, login=LOGIN
+        )
+
+    def test_client_of_each_thread(self):
+        client = self.get_client()
+        self.assertIs(self.get_client(), client)
+        with ThreadPoolExecutor(2) as executor:
+            others = list(executor.map(lambda i: self.get_client(), range(2)))
+        for other in others:
+            self.assertIsNot(other, client)
+            # the WSDL is parsed once
+            self.assertIs(other.wsdl, client.wsdl)
+            self.assertIsNot(other.options.transport, client.options.transport)
+            self.assertEqual(other.options.retxml, client.options.retxml)
+        client.set_options(soapheaders=("header",))
+        self.assertEqual(others[0].options.soapheaders, ())
+
+    def test_requests_from_threads(self):
+        def read(prm):
+            return lowatt_enedis.COMMAND_SERVICE["technical"][2](
+                self.get_client(),
+                {
+                    "login": LOGIN,
+                    "prm": prm,
+                    "autorisation": True,
+                    "cadre": "ACCORD_CLIENT",
+                    "corrigee": False,
+                },
+            )
+
+        prms = [f"{i:014d}" for i in range(16)]
+        with ThreadPoolExecutor(8) as executor:
+            responses = list(executor.map(read, prms))
+        for prm, response in zip(prms, responses):
+            self.assertIn(f'<point id="{prm}">'.encode(), response)
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import unittest
+from datetime import date, timedelta
+
+from pyscada.enedis.coverage import merge_ranges, missing_ranges, overlaps, split_ranges
+
+
+def day(n):
+    return date(2023, 1, 1) + timedelta(days=n)
+
+
+class MergeRangesTest(unittest.TestCase):
+    def test_adjacent(self):
+        self.assertEqual(
+            merge_ranges([(day(7), day(14)), (day(0), day(7))]), [(day(0), day(14))]
+        )
+
+    def test_overlapping(self):
+        self.assertEqual(
+            merge_ranges([(day(0), day(10)), (day(5), day(8)), (day(9), day(12))]),
+            [(day(0), day(12))],
+        )
+
+    def test_disjoint(self):
+        self.assertEqual(
+            merge_ranges([(day(5), day(6)), (day(0), day(2))]),
+            [(day(0), day(2)), (day(5), day(6))],
+        )
+
+    def test_empty(self):
+        self.assertEqual(merge_ranges([]), [])
+        # the empty and reversed ranges are ignored
+        self.assertEqual(
+            merge_ranges([(day(3), day(3)), (day(5), day(1)), (day(0), day(1))]),
+            [(day(0), day(1))],
+        )
+
+
+class MissingRangesTest(unittest.TestCase):
+    def test_nothing_covered(self):
+        self.assertEqual(missing_ranges([], day(0), day(10)), [(day(0), day(10))])
+
+    def test_gaps(self):
+        covered = [(day(2), day(4)), (day(4), day(6)), (day(8), day(9))]
+        self.assertEqual(
+            missing_ranges(covered, day(0), day(10)),
+            [(day(0), day(2)), (day(6), day(8)), (day(9), day(10))],
+        )
+
+    def test_boundaries(self):
+        # ranges ending at the start or starting at the end do not cover it
+        covered = [(day(-5), day(0)), (day(10), day(15))]
+        self.assertEqual(missing_ranges(covered, day(0), day(10)), [(day(0), day(10))])
+        self.assertEqual(missing_ranges([(day(-1), day(11))], day(0), day(10)), [])
+        self.assertEqual(missing_ranges([], day(3), day(3)), [])
+
+    def test_overlaps(self):
+        self.assertTrue(overlaps([(day(0), day(2))], day(1), day(3)))
+        self.assertFalse(overlaps([(day(0), day(2))], day(2), day(3)))
+        self.assertFalse(overlaps([], day(0), day(3)))
+
+
+class SplitRangesTest(unittest.TestCase):
+    def test_windows(self):
+        self.assertEqual(
+            split_ranges([(day(0), day(15))], timedelta(days=7)),
+            [(day(0), day(7)), (day(7), day(14)), (day(14), day(15))],
+        )
+
+    def test_exact_length(self):
+        self.assertEqual(
+            split_ranges([(day(0), day(14))], timedelta(days=7)),
+            [(day(0), day(7)), (day(7), day(14))],
+        )
+
+    def test_shorter_than_length(self):
+        self.assertEqual(
+            split_ranges([(day(0), day(1)), (day(3), day(5))], timedelta(days=7)),
+            [(day(0), day(1)), (day(3), day(5))],
+        )
+
+    def test_no_length(self):
+        self.assertEqual(split_ranges([(day(0), day(400))]), [(day(0), day(400))])
+
+    def test_empty(self):
+        self.assertEqual(split_ranges([]), [])
+        self.assertEqual(split_ranges([(day(3), day(3))], timedelta(days=7)), [])
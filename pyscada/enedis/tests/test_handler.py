@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import unittest
+
+import numpy as np
+
+try:
+    from pyscada.enedis.devices.enedis import DetailsV3Read, Handler
+except ImportError:
+    # PyScada is not installed
+    DetailsV3Read = Handler = None
+
+# local times of the autumn DST changeover in Paris, 02:00 and 02:30 are repeated
+AUTUMN_DATES = [
+    "2023-10-29 01:00:00",
+    "2023-10-29 01:30:00",
+    "2023-10-29 02:00:00",
+    "2023-10-29 02:30:00",
+    "2023-10-29 02:00:00",
+    "2023-10-29 02:30:00",
+    "2023-10-29 03:00:00",
+]
+# UTC hours of the dates
+AUTUMN_UTC = [
+    "2023-10-28T23:00",
+    "2023-10-28T23:30",
+    "2023-10-29T00:00",
+    "2023-10-29T00:30",
+    "2023-10-29T01:00",
+    "2023-10-29T01:30",
+    "2023-10-29T02:00",
+]
+
+
+@unittest.skipIf(Handler is None, "PyScada is not installed")
+class DetailsV3PointsTest(unittest.TestCase):
+    def get_points(self, points, xml_paths):
+        # the conversion does not use the device
+        return Handler._get_detailsV3_points(object.__new__(Handler), points, xml_paths)
+
+    def test_autumn_dst_two_variables(self):
+        points = {
+            ".//a/points": [(d, str(i)) for i, d in enumerate(AUTUMN_DATES)],
+            ".//b/points": [(d, str(10 + i)) for i, d in enumerate(AUTUMN_DATES)],
+        }
+        result = self.get_points(points, {1: ".//a/points", 2: ".//b/points"})
+        for var_id, offset in ((1, 0), (2, 10)):
+            values, timestamps = result[var_id]
+            utc = timestamps.astype("datetime64[s]").astype("datetime64[m]")
+            self.assertEqual([str(t) for t in utc], AUTUMN_UTC)
+            self.assertEqual(values.tolist(), [offset + i for i in range(7)])
+            self.assertEqual(len(set(timestamps.tolist())), len(AUTUMN_DATES))
+
+    def test_invalid_points(self):
+        points = {
+            ".//a/points": [
+                ("2023-10-01 00:30:00", "1"),
+                ("not a date", "2"),
+                ("2023-10-01 01:30:00", "not a value"),
+                (None, "4"),
+            ],
+            ".//b/points": [],
+        }
+        result = self.get_points(points, {1: ".//a/points", 2: ".//b/points"})
+        self.assertEqual(list(result), [1])
+        self.assertEqual(result[1][0].tolist(), [1.0])
+
+
+class FakeVariable(object):
+    def __init__(self):
+        self.values = []
+
+    def update_values(self, values, timestamps):
+        self.values += list(zip(values, timestamps))
+        return True
+
+
+@unittest.skipIf(Handler is None, "PyScada is not installed")
+class LatestPointTest(unittest.TestCase):
+    def setUp(self):
+        self.service_read = DetailsV3Read(
+            "COURBE", "PA", "detailsV3-COURBE-PA", {}, {}
+        )
+
+    def hold(self, var_id, values, timestamps):
+        values, timestamps = self.service_read.hold_latest(
+            var_id, np.array(values, dtype=float), np.array(timestamps, dtype=float)
+        )
+        return sorted(zip(timestamps.tolist(), values.tolist()))
+
+    def test_latest_point_held_across_flushes(self):
+        # the windows are flushed from the oldest, a point held is written later
+        self.assertEqual(self.hold(1, [1, 2, 3], [10, 30, 20]), [(10, 1), (20, 3)])
+        self.assertEqual(self.service_read.latest, {1: (2.0, 30.0)})
+        self.assertEqual(self.hold(1, [4, 5], [40, 50]), [(30, 2), (40, 4)])
+        self.assertEqual(self.hold(1, [6, 7], [50, 5]), [(5, 7)])
+        self.assertEqual(self.hold(1, [], []), [])
+        self.assertEqual(self.service_read.latest, {1: (5.0, 50.0)})
+        self.assertEqual(self.hold(2, [], []), [])
+        self.assertNotIn(2, self.service_read.latest)
+
+    def test_output_latest(self):
+        self.hold(1, [1, 2], [10, 20])
+        self.hold(2, [3], [30])
+        handler = object.__new__(Handler)
+        handler.variables_dict = {1: FakeVariable(), 2: FakeVariable()}
+        output = handler._output_latest(self.service_read)
+        self.assertEqual(output, [handler.variables_dict[1], handler.variables_dict[2]])
+        self.assertEqual(handler.variables_dict[1].values, [(2.0, 20.0)])
+        self.assertEqual(handler.variables_dict[2].values, [(3.0, 30.0)])
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import io
+import json
+import os
+import tempfile
+import unittest
+
+from django.core.exceptions import ValidationError
+
+try:
+    from pyscada.enedis import importer
+except ImportError:
+    # PyScada is not installed
+    importer = None
+
+ROWS = [
+    {
+        "prm": "12345678901234",
+        "login": "login@example.com",
+        "certificate": "cert.pem",
+        "key": "key.pem",
+        "authorization": "true",
+        "fields": "all",
+        "name": "",
+    },
+    {
+        "prm": "98765432109876",
+        "login": "login@example.com",
+        "certificate": "cert.pem",
+        "key": "key.pem",
+        "authorization": "false",
+        "fields": "1;2",
+        "name": "site 2",
+    },
+]
+
+
+@unittest.skipIf(importer is None, "PyScada is not installed")
+class ReadRowsTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def write(self, name, text):
+        file_path = os.path.join(self.directory.name, name)
+        with open(file_path, "w", encoding="utf-8") as f:
+            f.write(text)
+        return file_path
+
+    def test_formats(self):
+        header = list(ROWS[0])
+        csv_text = "\n".join(
+            [",".join(header)] + [",".join(row[key] for key in header) for row in ROWS]
+        )
+        jsonl_text = "\n".join(json.dumps(row) for row in ROWS) + "\n\n"
+        for name, text in (
+            ("devices.csv", csv_text),
+            ("devices.json", json.dumps(ROWS, indent=2)),
+            ("devices.jsonl", jsonl_text),
+        ):
+            self.assertEqual(list(importer.read_rows(self.write(name, text))), ROWS)
+        with self.assertRaises(ValueError):
+            list(importer.read_rows(self.write("devices.txt", csv_text)))
+
+    def test_json_chunks(self):
+        rows = ROWS * 50 + [12345678, 1.5e10, "x,]", [1, [2]], None, True]
+        text = "\n " + json.dumps(rows, indent=1) + "\n"
+        for chunk_size in (1, 2, 3, 7, 100, 64 * 1024):
+            self.assertEqual(
+                list(importer.read_json_list(io.StringIO(text), chunk_size)), rows
+            )
+        self.assertEqual(list(importer.read_json_list(io.StringIO(" [ ] "))), [])
+
+    def test_invalid_json(self):
+        for text in ('{"a": 1}', "[1,]", "[1 2]", "[1] 2", "[1", '[{"a":', "", "[,1]"):
+            with self.assertRaises(ValueError):
+                list(importer.read_json_list(io.StringIO(text), 3))
+
+    def test_json_rows_read_one_at_a_time(self):
+        text = json.dumps(ROWS * 1000)
+        f = io.StringIO(text)
+        rows = importer.read_json_list(f, 1024)
+        self.assertEqual(next(rows), ROWS[0])
+        self.assertLess(f.tell(), 4096)
+
+
+@unittest.skipIf(importer is None, "PyScada is not installed")
+class ParseRowTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.row = dict(ROWS[0], fields="")
+        for key in ("certificate", "key"):
+            self.row[key] = os.path.join(self.directory.name, self.row[key])
+            with open(self.row[key], "w") as f:
+                f.write("")
+
+    def test_files(self):
+        sgetiers_device, name, fields = importer.parse_row(self.row, {})
+        self.assertEqual(sgetiers_device.certificat, self.row["certificate"])
+        self.assertEqual(sgetiers_device.private_key, self.row["key"])
+        self.assertEqual(name, self.row["prm"])
+        for key in ("certificate", "key"):
+            row = dict(self.row, **{key: self.row[key] + ".missing"})
+            with self.assertRaisesRegex(ValidationError, "does not exist"):
+                importer.parse_row(row, {})
+
+    def test_dry_run_result(self):
+        result = importer.ImportResult(dry_run=True)
+        result.rows, result.created = 2, 1
+        self.assertIn("1 devices would be created", str(result))
+        result.dry_run = False
+        self.assertIn("1 devices created", str(result))
@@ -0,0 +1,241 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import unittest
+from datetime import date, datetime, timedelta
+
+import defusedxml.ElementTree as ET
+import numpy as np
+from pytz import AmbiguousTimeError, NonExistentTimeError, timezone, utc
+
+from pyscada.enedis.defaults import SGE_TIERS_FIELDS
+from pyscada.enedis.mockserver import details_response, technical_response
+from pyscada.enedis.parsing import (
+    extract_points,
+    get_path_plan,
+    local_to_utc_timestamps,
+    text_to_float,
+)
+
+PARIS = timezone("Europe/Paris")
+PRM = "12345678901234"
+START = date(2023, 1, 2)
+
+
+def local_series(start, end, minutes=30):
+    """
+    return the local date texts of a series from start to end in UTC,
+    the times repeated at the end of the daylight saving time appear twice
+    like in the Enedis responses
+    """
+    t = utc.localize(datetime.fromisoformat(start))
+    end = utc.localize(datetime.fromisoformat(end))
+    dates = []
+    while t <= end:
+        dates.append(t.astimezone(PARIS).strftime("%Y-%m-%d %H:%M:%S"))
+        t += timedelta(minutes=minutes)
+    return dates
+
+
+def pytz_timestamps(dates):
+    """
+    reference conversion with pytz : the first occurrence of a repeated time is the
+    summer time, the next ones the winter time, a skipped time uses the winter offset
+    """
+    seen = set()
+    timestamps = []
+    for d in dates:
+        t = datetime.fromisoformat(d)
+        try:
+            local = PARIS.localize(t, is_dst=None)
+        except AmbiguousTimeError:
+            local = PARIS.localize(t, is_dst=t not in seen)
+        except NonExistentTimeError:
+            local = PARIS.localize(t, is_dst=False)
+        timestamps.append(local.timestamp())
+        seen.add(t)
+    return timestamps
+
+
+def findall_points(response, xml_paths, fields=("d", "v")):
+    """
+    reference extraction with findall on the whole document
+    """
+    root = ET.fromstring(response)
+    result = {}
+    for xml_path in xml_paths:
+        if fields is None:
+            result[xml_path] = [elem.text for elem in root.findall(xml_path)]
+        else:
+            result[xml_path] = [
+                tuple(elem.findtext(field) for field in fields)
+                for elem in root.findall(xml_path)
+            ]
+    return result
+
+
+def field_paths(command_service_type):
+    return [
+        xml_path
+        for label, service, xml_path, unit in SGE_TIERS_FIELDS
+        if service == command_service_type
+    ]
+
+
+class ExtractPointsTest(unittest.TestCase):
+    def assertSameAsFindall(self, response, xml_paths, fields=("d", "v")):
+        result = extract_points(response, xml_paths, fields)
+        self.assertEqual(result, findall_points(response, xml_paths, fields))
+        return result
+
+    def test_courbe(self):
+        response = details_response(PRM, "COURBE", "PA", START, START + timedelta(7))
+        xml_paths = field_paths("detailsV3-COURBE-PA")
+        result = self.assertSameAsFindall(response, xml_paths)
+        self.assertEqual(len(result[".//grandeur/points"]), 7 * 48)
+
+    def test_energie(self):
+        response = details_response(PRM, "ENERGIE", "EA", START, START + timedelta(7))
+        xml_paths = field_paths("detailsV3-ENERGIE-EA")
+        result = self.assertSameAsFindall(response, xml_paths)
+        self.assertEqual(len(result[".//grandeur/points"]), 7)
+
+    def test_index_predicates(self):
+        response = details_response(PRM, "INDEX", "EA", START, START + timedelta(7))
+        xml_paths = field_paths("detailsV3-INDEX-HC")
+        xml_paths += field_paths("detailsV3-INDEX-HP")
+        self.assertTrue(get_path_plan(xml_paths).supported)
+        result = self.assertSameAsFindall(response, xml_paths)
+        hc, hp = [result[xml_path] for xml_path in xml_paths]
+        self.assertEqual(len(hc), 7)
+        self.assertEqual(len(hp), 7)
+        self.assertNotEqual(hc, hp)
+
+    def test_technical(self):
+        xml_paths = field_paths("technical")
+        self.assertTrue(get_path_plan(xml_paths).supported)
+        result = self.assertSameAsFindall(technical_response(PRM), xml_paths, None)
+        self.assertEqual(result[".//donneesGenerales/segment/libelle"], ["C5"])
+
+    def test_predicates(self):
+        response = (
+            "<r><a><b id='1'><c>x</c><p><d>1</d><v>2</v></p></b>"
+            "<b id='2'><p><d>3</d><v>4</v></p><c>y</c></b>"
+            "<b><p><d>5</d></p></b></a></r>"
+        )
+        xml_paths = [
+            ".//b[@id]/p",
+            ".//b[@id='2']/p",
+            "./a/b[c]/p",
+            "a/b[c='y']/p",
+            ".//a/[b]/b/p",
+            ".//b/p",
+        ]
+        self.assertTrue(get_path_plan(xml_paths).supported)
+        result = self.assertSameAsFindall(response, xml_paths)
+        # the predicate on c is checked once b is closed
+        self.assertEqual(result["a/b[c='y']/p"], [("3", "4")])
+        self.assertEqual(result[".//b/p"][-1], ("5", None))
+
+    def test_large_document(self):
+        end = START + timedelta(365)
+        response = details_response(PRM, "COURBE", "PA", START, end)
+        result = self.assertSameAsFindall(response, [".//grandeur/points"])
+        self.assertEqual(len(result[".//grandeur/points"]), 365 * 48)
+        response = details_response(PRM, "INDEX", "EA", START, end)
+        self.assertSameAsFindall(response, field_paths("detailsV3-INDEX-HC"))
+
+    def test_predicate_across_chunks(self):
+        # iterparse reads the document by 16 KiB chunks, the element checked
+        # by the predicate is read before or after the end of a chunk
+        xml_paths = [".//b[c]/p", ".//b/c", ".//b[c='z']/p"]
+        for padding in range(16384 - 96, 16384 + 16):
+            response = (
+                f"<r><x>{'y' * padding}</x><a><b><c>z</c><p><d>1</d><v>2</v></p></b>"
+                f"<b><p><d>3</d><v>4</v></p><c>z</c></b></a></r>"
+            )
+            result = self.assertSameAsFindall(response, xml_paths)
+            self.assertEqual(result[".//b[c]/p"], [("1", "2"), ("3", "4")])
+
+    def test_findall_fallback(self):
+        response = details_response(PRM, "INDEX", "EA", START, START + timedelta(3))
+        xml_paths = [".//calendrier/*/valeur", ".//grandeur//valeur"]
+        for xml_path in xml_paths:
+            self.assertFalse(get_path_plan([xml_path]).supported)
+        # one path which cannot be streamed reads all the paths with findall
+        xml_paths.append(".//valeur")
+        self.assertFalse(get_path_plan(xml_paths).supported)
+        result = self.assertSameAsFindall(response, xml_paths)
+        self.assertEqual(len(result[".//valeur"]), 6)
+
+    def test_path_plan_cache(self):
+        plan = get_path_plan(["a/b", "c/d"])
+        self.assertIs(plan, get_path_plan(["c/d", "a/b", "a/b"]))
+
+
+class LocalToUTCTimestampsTest(unittest.TestCase):
+    def assertSameAsPytz(self, dates):
+        timestamps, valid = local_to_utc_timestamps(dates)
+        self.assertTrue(valid.all())
+        self.assertEqual(timestamps.tolist(), pytz_timestamps(dates))
+
+    def test_spring_gap(self):
+        dates = local_series("2023-03-25 23:00:00", "2023-03-26 04:00:00")
+        self.assertNotIn("2023-03-26 02:30:00", dates)
+        self.assertSameAsPytz(dates)
+
+    def test_skipped_times(self):
+        self.assertSameAsPytz(
+            ["2023-03-26 01:30:00", "2023-03-26 02:00:00", "2023-03-26 02:30:00"]
+        )
+
+    def test_autumn_fold(self):
+        dates = local_series("2023-10-28 22:00:00", "2023-10-29 04:00:00")
+        self.assertEqual(dates.count("2023-10-29 02:00:00"), 2)
+        self.assertSameAsPytz(dates)
+        timestamps, valid = local_to_utc_timestamps(dates)
+        self.assertEqual(len(set(timestamps.tolist())), len(dates))
+
+    def test_year(self):
+        self.assertSameAsPytz(
+            local_series("2022-12-31 23:30:00", "2023-12-31 23:00:00")
+        )
+
+    def test_repeated_series(self):
+        # each series is converted by its own call, like the series of each variable
+        for start, end in (
+            ("2023-03-25 23:00:00", "2023-03-26 04:00:00"),
+            ("2023-10-28 22:00:00", "2023-10-29 04:00:00"),
+        ):
+            dates = local_series(start, end)
+            first, valid = local_to_utc_timestamps(dates)
+            second, valid = local_to_utc_timestamps(dates)
+            self.assertEqual(first.tolist(), second.tolist())
+            self.assertEqual(second.tolist(), pytz_timestamps(dates))
+
+    def test_repeated_series_in_one_call(self):
+        # the next occurrences of a repeated time are winter times
+        dates = local_series("2023-10-28 23:30:00", "2023-10-29 02:00:00")
+        timestamps, valid = local_to_utc_timestamps(dates + dates)
+        self.assertEqual(timestamps[: len(dates)].tolist(), pytz_timestamps(dates))
+        self.assertEqual(timestamps.tolist(), pytz_timestamps(dates + dates))
+
+    def test_days(self):
+        self.assertSameAsPytz(["2023-03-26", "2023-03-27", "2023-10-29", "2023-10-30"])
+
+    def test_aware_and_invalid_dates(self):
+        timestamps, valid = local_to_utc_timestamps(
+            ["2023-10-29T02:30:00+02:00", "not a date", "2023-10-29 02:30:00", None]
+        )
+        self.assertEqual(valid.tolist(), [True, False, True, False])
+        expected = datetime.fromisoformat("2023-10-29T00:30:00+00:00").timestamp()
+        self.assertEqual(timestamps[0], expected)
+        self.assertEqual(timestamps[2], timestamps[0])
+        self.assertTrue(np.isnan(timestamps[[1, 3]]).all())
+
+
+class TextToFloatTest(unittest.TestCase):
+    def test_invalid_values(self):
+        values, valid = text_to_float(["1", "2.5", "x", None])
+        self.assertEqual(valid.tolist(), [True, True, False, False])
+        self.assertEqual(values[valid].tolist(), [1.0, 2.5])
@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import json
+import multiprocessing
+import os
+import tempfile
+import unittest
+from threading import Thread
+from unittest import mock
+
+from pyscada.enedis import ratelimit
+from pyscada.enedis.ratelimit import QuotaExceeded, RateLimiter, get_rate_limiter
+
+
+class FakeClock(object):
+    """
+    time and sleep of the rate limiter, sleep moves the clock forward
+    """
+
+    def __init__(self, now=1000.0):
+        self.now = now
+        self.sleeps = []
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def take_tokens(state_file, count, results):
+    limiter = RateLimiter("login", per_second=0.001, burst=count, state_file=state_file)
+    results.put(sum(limiter.acquire(timeout=0) for i in range(count)))
+
+
+class RateLimiterTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        for name in ("time", "sleep"):
+            patcher = mock.patch.object(ratelimit, name, getattr(self.clock, name))
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.state_file = os.path.join(self.directory.name, "login.json")
+
+    def test_burst_and_refill(self):
+        limiter = RateLimiter("login", per_second=2.0, burst=3)
+        for i in range(3):
+            self.assertEqual(limiter._take_locked(), 0)
+        self.assertEqual(limiter._take_locked(), 0.5)
+        self.clock.now += 0.5
+        self.assertEqual(limiter._take_locked(), 0)
+        # the bucket does not refill above the burst
+        self.clock.now += 60
+        for i in range(3):
+            self.assertEqual(limiter._take_locked(), 0)
+        self.assertGreater(limiter._take_locked(), 0)
+
+    def test_acquire_waits(self):
+        limiter = RateLimiter("login", per_second=4.0, burst=1)
+        self.assertTrue(limiter.acquire())
+        self.assertTrue(limiter.acquire(timeout=1))
+        self.assertEqual(self.clock.sleeps, [0.25])
+        self.assertEqual(self.clock.now, 1000.25)
+
+    def test_acquire_timeout(self):
+        limiter = RateLimiter("login", per_second=0.5, burst=1)
+        self.assertTrue(limiter.acquire(timeout=0))
+        # the next token comes in 2 s, longer than the timeout : no wait
+        self.assertFalse(limiter.acquire(timeout=1))
+        self.assertEqual(self.clock.sleeps, [])
+        self.assertTrue(limiter.acquire(timeout=2))
+        self.assertEqual(self.clock.sleeps, [2.0])
+
+    def test_daily_quota(self):
+        limiter = RateLimiter("login", per_second=100.0, burst=10, per_day=2)
+        self.assertTrue(limiter.acquire())
+        self.assertTrue(limiter.acquire())
+        with self.assertRaises(QuotaExceeded) as cm:
+            limiter.acquire()
+        self.assertEqual(cm.exception.code, "SGT589")
+        # the count restarts the next day
+        limiter._state["day"] = "2000-01-01"
+        self.assertTrue(limiter.acquire())
+
+    def test_state_file(self):
+        first, second = [
+            RateLimiter("login", per_second=1.0, burst=2, state_file=self.state_file)
+            for i in range(2)
+        ]
+        self.assertTrue(first.acquire(timeout=0))
+        self.assertTrue(second.acquire(timeout=0))
+        # the bucket is shared : both limiters have no token left
+        self.assertFalse(first.acquire(timeout=0))
+        self.assertFalse(second.acquire(timeout=0))
+        with open(self.state_file) as f:
+            state = json.load(f)
+        self.assertEqual(state["day_count"], 2)
+        self.assertLess(state["tokens"], 1)
+        self.clock.now += 1
+        self.assertTrue(second.acquire(timeout=0))
+
+    def test_invalid_state_file(self):
+        with open(self.state_file, "w") as f:
+            f.write("not json")
+        limiter = RateLimiter("login", burst=1, state_file=self.state_file)
+        with self.assertLogs(ratelimit.logger, "WARNING"):
+            self.assertTrue(limiter.acquire(timeout=0))
+        with open(self.state_file) as f:
+            self.assertEqual(json.load(f)["day_count"], 1)
+
+
+class SharedRateLimiterTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.state_file = os.path.join(self.directory.name, "login.json")
+
+    def test_threads(self):
+        limiter = RateLimiter("login", per_second=0.001, burst=20)
+        taken = []
+        threads = [
+            Thread(target=lambda: taken.append(limiter.acquire(timeout=0)))
+            for i in range(40)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(taken.count(True), 20)
+
+    def test_processes(self):
+        # each process takes all the tokens of its own burst from the shared bucket,
+        # the state file limits them to the tokens of the first burst
+        context = multiprocessing.get_context("fork")
+        results = context.Queue()
+        processes = [
+            context.Process(target=take_tokens, args=(self.state_file, 10, results))
+            for i in range(4)
+        ]
+        for process in processes:
+            process.start()
+        taken = [results.get(timeout=30) for process in processes]
+        for process in processes:
+            process.join()
+        self.assertEqual(sum(taken), 10)
+        with open(self.state_file) as f:
+            self.assertEqual(json.load(f)["day_count"], 10)
+
+    def test_get_rate_limiter(self):
+        settings = {
+            "rate_limits": {
+                "default": {"per_second": 5.0, "burst": 5, "per_day": None},
+                "Contract 1": {"per_day": 100},
+            },
+            "rate_limit_state_dir": os.path.join(self.directory.name, "state"),
+        }
+        with mock.patch.object(
+            ratelimit, "get_setting", side_effect=settings.get
+        ), mock.patch.dict(ratelimit._limiters, clear=True):
+            limiter = get_rate_limiter("Contract 1")
+            self.assertIs(get_rate_limiter("Contract 1"), limiter)
+            self.assertEqual(limiter.per_second, 5.0)
+            self.assertEqual(limiter.per_day, 100)
+            self.assertEqual(
+                limiter.state_file,
+                os.path.join(self.directory.name, "state", "contract-1.json"),
+            )
+            self.assertIsNone(get_rate_limiter("other").per_day)
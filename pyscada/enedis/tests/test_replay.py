@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import os
+import re
+import tempfile
+import unittest
+from datetime import date, timedelta
+from unittest import mock
+
+from pyscada.enedis import replay
+from pyscada.enedis.mockserver import details_response
+from pyscada.enedis.replay import (
+    RECORD,
+    REPLAY,
+    FixtureNotFound,
+    Fixtures,
+    get_fixtures,
+    shift_dates,
+)
+
+PRM = "12345678901234"
+OTHER_PRM = "98765432109876"
+START = date(2023, 1, 2)
+
+
+def request(start, days, prm=PRM, type_code="COURBE"):
+    return {
+        "prm": prm,
+        "type": type_code,
+        "courbe_type": "PA",
+        "from": start.isoformat(),
+        "to": (start + timedelta(days)).isoformat(),
+    }
+
+
+def response(input_dict):
+    return details_response(
+        input_dict["prm"],
+        input_dict["type"],
+        input_dict["courbe_type"],
+        date.fromisoformat(input_dict["from"]),
+        date.fromisoformat(input_dict["to"]),
+    )
+
+
+def summary(response):
+    """
+    return the PRM, the dates and the values of a response
+    """
+    return (
+        re.findall(rb"<pointId>(\d+)</pointId>", response),
+        re.findall(rb"\d{4}-\d{2}-\d{2}[^<]*", response),
+        re.findall(rb"<v>([^<]*)</v>", response),
+    )
+
+
+class ShiftDatesTest(unittest.TestCase):
+    def test_shift(self):
+        self.assertEqual(
+            shift_dates(
+                b"<d>2023-01-31 23:30:00</d><d>2023-02-01T00:00:00+01:00</d>",
+                timedelta(29),
+            ),
+            b"<d>2023-03-01 23:30:00</d><d>2023-03-02T00:00:00+01:00</d>",
+        )
+        self.assertEqual(
+            shift_dates(b"<d>2024-03-01</d>", timedelta(-1)), b"<d>2024-02-29</d>"
+        )
+
+    def test_invalid_dates(self):
+        text = b"<v>2023-02-30</v><id>12345678901234</id>"
+        self.assertEqual(shift_dates(text, timedelta(1)), text)
+
+    def test_response(self):
+        recorded = response(request(START, 7))
+        prms, dates, values = summary(shift_dates(recorded, timedelta(100)))
+        expected = response(request(START + timedelta(100), 7))
+        self.assertEqual(dates, summary(expected)[1])
+        self.assertEqual(values, summary(recorded)[2])
+
+
+class FixturesTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.fixtures = Fixtures(self.directory.name)
+
+    def record(self, input_dict):
+        self.assertTrue(
+            self.fixtures.record("detailsV3", input_dict, response(input_dict))
+        )
+
+    def assertReplayed(self, input_dict, recorded, days=None):
+        """
+        check the response of the request is the recorded one for the PRM requested,
+        shifted to the start requested
+        """
+        replayed = self.fixtures.replay("detailsV3", input_dict)
+        start = date.fromisoformat(input_dict["from"])
+        if days is None:
+            days = (date.fromisoformat(input_dict["to"]) - start).days
+        prms, dates, values = summary(replayed)
+        self.assertEqual(prms, [input_dict["prm"].encode()])
+        self.assertEqual(dates, summary(response(request(start, days)))[1])
+        self.assertEqual(values, summary(response(recorded))[2])
+
+    def test_same_request(self):
+        input_dict = request(START, 7)
+        self.record(input_dict)
+        self.assertEqual(
+            os.listdir(os.path.join(self.directory.name, "detailsv3-courbe-pa")),
+            [f"{PRM}_2023-01-02_2023-01-09.xml"],
+        )
+        self.assertEqual(
+            self.fixtures.replay("detailsV3", input_dict), response(input_dict)
+        )
+        # the responses which are not bytes are not recorded
+        self.assertFalse(self.fixtures.record("detailsV3", input_dict, None))
+
+    def test_other_prm_and_window(self):
+        self.record(request(START, 7))
+        self.assertReplayed(
+            request(START + timedelta(30), 7, prm=OTHER_PRM), request(START, 7)
+        )
+
+    def test_closest_window_length(self):
+        for days in (1, 7, 30):
+            self.record(request(START, days))
+        for days, recorded in ((2, 1), (6, 7), (10, 7), (25, 30), (90, 30)):
+            self.assertReplayed(
+                request(START + timedelta(60), days), request(START, recorded), recorded
+            )
+
+    def test_groups(self):
+        self.record(request(START, 7))
+        with self.assertRaises(FixtureNotFound):
+            self.fixtures.replay("detailsV3", request(START, 7, type_code="ENERGIE"))
+        self.record(request(START, 7, type_code="ENERGIE"))
+        self.assertIn(
+            b"ENERGIE",
+            self.fixtures.replay("detailsV3", request(START, 7, type_code="ENERGIE")),
+        )
+
+    def test_new_recording(self):
+        # the index of a group is read again after a new recording
+        self.record(request(START, 7))
+        self.fixtures.replay("detailsV3", request(START, 1))
+        self.record(request(START, 1))
+        self.assertReplayed(request(START + timedelta(10), 1), request(START, 1))
+
+    def test_get_fixtures(self):
+        settings = {"replay_mode": REPLAY, "replay_dir": self.directory.name}
+        with mock.patch.object(
+            replay, "get_setting", side_effect=settings.get
+        ), mock.patch.dict(replay._fixtures, clear=True):
+            mode, fixtures = get_fixtures()
+            self.assertEqual(mode, REPLAY)
+            self.assertEqual(get_fixtures(), (REPLAY, fixtures))
+            settings["replay_mode"] = RECORD
+            self.assertEqual(get_fixtures(), (RECORD, fixtures))
+            settings["replay_mode"] = "other"
+            self.assertEqual(get_fixtures(), (None, None))
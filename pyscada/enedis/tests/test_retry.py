@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import unittest
+
+from pyscada.enedis.mockserver import FUNCTIONAL_ERRORS, QUOTA_ERROR, TECHNICAL_ERRORS
+from pyscada.enedis.retry import (
+    FUNCTIONAL,
+    QUOTA,
+    TECHNICAL,
+    UNKNOWN,
+    classify_error,
+    get_error_code,
+)
+
+
+class ClassifyErrorTest(unittest.TestCase):
+    def assertCategory(self, code, message, category):
+        # lowatt_enedis raises the SGE faults as "code: message"
+        error = Exception(f"{code}: {message}")
+        self.assertEqual(get_error_code(error), code)
+        self.assertEqual(classify_error(error), category)
+
+    def test_mockserver_errors(self):
+        for code, message in FUNCTIONAL_ERRORS:
+            self.assertCategory(code, message, FUNCTIONAL)
+        for code, message in TECHNICAL_ERRORS:
+            self.assertCategory(code, message, TECHNICAL)
+        self.assertCategory(*QUOTA_ERROR, QUOTA)
+        self.assertCategory(
+            "SGT4F2", "Les dates de la demande sont invalides.", FUNCTIONAL
+        )
+        self.assertCategory("SGT400", "Service inconnu.", FUNCTIONAL)
+
+    def test_unknown_codes(self):
+        self.assertCategory("SGT4Z9", "", FUNCTIONAL)
+        self.assertCategory("SGT5A1", "", TECHNICAL)
+        self.assertCategory("SGT600", "", UNKNOWN)
+
+    def test_no_code(self):
+        self.assertIsNone(get_error_code(ConnectionError("timed out")))
+        self.assertEqual(classify_error(ConnectionError("timed out")), UNKNOWN)
+        self.assertEqual(classify_error(Exception("sgt4l8")), UNKNOWN)
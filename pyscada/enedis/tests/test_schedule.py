@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+
+from pytz import timezone, utc
+
+from pyscada.enedis import schedule
+from pyscada.enedis.schedule import get_interval, get_jitter, next_poll
+from pyscada.enedis.utils import DEFAULT_SETTINGS
+
+PARIS = timezone("Europe/Paris")
+COURBE = "detailsV3-COURBE-PA"
+
+
+def paris(*args):
+    return PARIS.localize(datetime(*args))
+
+
+class NextPollTest(unittest.TestCase):
+    def assertPoll(self, now, expected, command_service=COURBE, device_id=1):
+        jitter = timedelta(seconds=get_jitter(device_id, command_service))
+        poll = next_poll(command_service, device_id, now=now)
+        self.assertEqual(poll, expected + jitter)
+
+    def test_before_publication(self):
+        self.assertPoll(paris(2023, 1, 10, 7, 59), paris(2023, 1, 10, 8))
+        self.assertPoll(paris(2023, 1, 10, 0, 0), paris(2023, 1, 10, 8))
+
+    def test_after_publication(self):
+        self.assertPoll(paris(2023, 1, 10, 8), paris(2023, 1, 11, 8))
+        self.assertPoll(paris(2023, 1, 10, 23, 30), paris(2023, 1, 11, 8))
+        self.assertPoll(paris(2023, 12, 31, 9), paris(2024, 1, 1, 8))
+
+    def test_utc_now(self):
+        # 6h30 UTC is 7h30 in Paris in winter and 8h30 in summer
+        self.assertPoll(
+            utc.localize(datetime(2023, 1, 10, 6, 30)), paris(2023, 1, 10, 8)
+        )
+        self.assertPoll(
+            utc.localize(datetime(2023, 7, 10, 6, 30)), paris(2023, 7, 11, 8)
+        )
+
+    def test_daylight_saving_time(self):
+        # the publication stays at 8h local time across the changes of offset
+        self.assertPoll(paris(2023, 3, 25, 12), paris(2023, 3, 26, 8))
+        self.assertEqual(paris(2023, 3, 26, 8).utcoffset(), timedelta(hours=2))
+        self.assertPoll(paris(2023, 10, 28, 12), paris(2023, 10, 29, 8))
+        self.assertEqual(paris(2023, 10, 29, 8).utcoffset(), timedelta(hours=1))
+
+    def test_longer_interval(self):
+        intervals = dict(DEFAULT_SETTINGS["service_intervals"], ENERGIE=3 * 86400)
+        settings = dict(DEFAULT_SETTINGS, service_intervals=intervals)
+        with mock.patch.object(schedule, "get_setting", side_effect=settings.get):
+            # the first publication two days later
+            self.assertPoll(
+                paris(2023, 1, 10, 7), paris(2023, 1, 12, 8), "detailsV3-ENERGIE-EA"
+            )
+            self.assertPoll(
+                paris(2023, 1, 10, 9), paris(2023, 1, 13, 8), "detailsV3-ENERGIE-EA"
+            )
+
+    def test_incomplete(self):
+        now = paris(2023, 1, 10, 12)
+        self.assertEqual(next_poll(COURBE, 1, complete=False, now=now), now)
+
+    def test_technical(self):
+        self.assertEqual(get_interval("technical"), 7 * 86400)
+        now = paris(2023, 1, 10, 12, 34)
+        jitter = timedelta(seconds=get_jitter(1, "technical"))
+        self.assertEqual(
+            next_poll("technical", 1, now=now), now + timedelta(days=7) + jitter
+        )
+        # the technical data is not read at the publication time
+        self.assertEqual(
+            next_poll("technical", 1, complete=False, now=now),
+            now + timedelta(days=7) + jitter,
+        )
+
+    def test_jitter(self):
+        jitters = [
+            get_jitter(device_id, command_service)
+            for device_id in range(1000)
+            for command_service in (COURBE, "detailsV3-INDEX-EA", "technical")
+        ]
+        self.assertTrue(all(0 <= jitter < 7200 for jitter in jitters))
+        # spread across the whole range
+        self.assertLess(min(jitters), 60)
+        self.assertGreater(max(jitters), 7200 - 60)
+        self.assertGreater(len(set(jitters)), 2990)
+        # the same for each read of a device
+        self.assertEqual(get_jitter(42, COURBE), get_jitter(42, COURBE))
+        now = paris(2023, 1, 10, 12)
+        for device_id in range(100):
+            poll = next_poll(COURBE, device_id, now=now)
+            self.assertGreaterEqual(poll, paris(2023, 1, 11, 8))
+            self.assertLess(poll, paris(2023, 1, 11, 10))
+
+    def test_no_jitter(self):
+        settings = dict(DEFAULT_SETTINGS, schedule_jitter=0)
+        with mock.patch.object(schedule, "get_setting", side_effect=settings.get):
+            self.assertEqual(get_jitter(1, COURBE), 0)
+            self.assertEqual(
+                next_poll(COURBE, 1, now=paris(2023, 1, 10, 7)), paris(2023, 1, 10, 8)
+            )
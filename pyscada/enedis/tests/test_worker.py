@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import unittest
+from unittest import mock
+
+try:
+    from pyscada.enedis import worker
+except ImportError:
+    # PyScada is not installed
+    worker = None
+
+
+class FakeReadTasks(object):
+    """
+    queryset of read tasks keeping the filters of the updates
+    """
+
+    def __init__(self, updates, filters=()):
+        self.updates = updates
+        self.filters = filters
+
+    def filter(self, *args, **kwargs):
+        return FakeReadTasks(self.updates, self.filters + args)
+
+    def count(self):
+        return 1
+
+    def update(self, **kwargs):
+        self.updates.append((self.filters[-1], sorted(kwargs)))
+
+
+class FakeDevice(object):
+    driver_ok = True
+    driver_handler_ok = True
+    _h = None
+
+    def __init__(self, data):
+        self.data = data
+
+    def request_data(self):
+        return self.data
+
+
+@unittest.skipIf(worker is None, "PyScada is not installed")
+class ReadTasksTest(unittest.TestCase):
+    def test_filter(self):
+        self.assertEqual(
+            worker.read_tasks_filter([3]),
+            worker.Q(device_id__in=[3])
+            | worker.Q(variable__device_id__in=[3])
+            | worker.Q(variable_property__variable__device_id__in=[3]),
+        )
+
+    @mock.patch("pyscada.enedis.worker.write_textfile")
+    @mock.patch("pyscada.enedis.worker.collect_technical")
+    @mock.patch("pyscada.enedis.worker.get_setting", return_value=2)
+    def test_tasks_of_each_device(self, *mocks):
+        # the tasks of the variables and variable properties of a device are
+        # marked done or failed with the tasks of the device
+        process = object.__new__(worker.SGETiersDAQProcess)
+        process.process_id = 1
+        process.device_ids = [1, 2]
+        process.devices = {1: FakeDevice([]), 2: FakeDevice(None)}
+        process.last_query = 0
+        process.dt_query_data = 3600.0
+        updates = []
+        objects = FakeReadTasks(updates)
+        with mock.patch.object(worker.DeviceReadTask, "objects", objects):
+            process.loop()
+        self.assertEqual(
+            updates,
+            [
+                (worker.read_tasks_filter([1]), ["done", "finished"]),
+                (worker.read_tasks_filter([2]), ["failed", "finished"]),
+            ],
+        )
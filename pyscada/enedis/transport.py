@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from pyscada.enedis.utils import get_setting
+
+from io import BytesIO
+from threading import Lock
+from time import time
+import ssl
+
+import certifi
+import requests
+from requests.adapters import HTTPAdapter
+from suds.transport import Reply, TransportError
+from suds.transport.http import HttpTransport
+from urllib3.util.retry import Retry
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+# {(certificate_file, key_file): PooledSession}
+_sessions = {}
+_sessions_lock = Lock()
+
+
+class _ClientCertAdapter(HTTPAdapter):
+    """
+    HTTPS adapter using one SSL context, the certificate and key are loaded once
+    """
+
+    def __init__(self, ssl_context, **kwargs):
+        self.ssl_context = ssl_context
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs["ssl_context"] = self.ssl_context
+        return super().init_poolmanager(*args, **kwargs)
+
+    def proxy_manager_for(self, *args, **kwargs):
+        kwargs["ssl_context"] = self.ssl_context
+        return super().proxy_manager_for(*args, **kwargs)
+
+
+class PooledSession(object):
+    """
+    requests session keeping the connections open for a certificate and key,
+    the idle connections are closed after https_idle_timeout seconds
+    """
+
+    def __init__(self, certificate_file, key_file):
+        self.certificate_file = certificate_file
+        self.key_file = key_file
+        self.idle_timeout = float(get_setting("https_idle_timeout"))
+        self.pool_size = max(1, int(get_setting("https_pool_size")))
+        self.session = requests.Session()
+        self.session.mount("http://", HTTPAdapter(pool_maxsize=self.pool_size))
+        # the certificate is loaded by the first HTTPS request
+        self._https = False
+        self.last_used = time()
+        self._lock = Lock()
+
+    def _mount_https(self):
+        context = ssl.create_default_context(cafile=certifi.where())
+        context.load_cert_chain(self.certificate_file, self.key_file)
+        # retry once if a kept alive connection was closed by the server
+        adapter = _ClientCertAdapter(
+            context,
+            pool_connections=self.pool_size,
+            pool_maxsize=self.pool_size,
+            max_retries=Retry(total=1, connect=1, read=0, status=0, redirect=0),
+        )
+        self.session.mount("https://", adapter)
+        self._https = True
+
+    def post(self, url, data, headers, timeout):
+        with self._lock:
+            if not self._https and url.startswith("https://"):
+                self._mount_https()
+            if time() - self.last_used > self.idle_timeout:
+                # the server may have closed them
+                self.session.close()
+            self.last_used = time()
+        return self.session.post(url, data=data, headers=headers, timeout=timeout)
+
+    def close(self):
+        self.session.close()
+
+
+def get_session(certificate_file, key_file):
+    """
+    return the session shared by the clients using the certificate and key
+    """
+    key = (certificate_file, key_file)
+    with _sessions_lock:
+        if key not in _sessions:
+            _sessions[key] = PooledSession(certificate_file, key_file)
+        return _sessions[key]
+
+
+def close_sessions(certificate_file=None, key_file=None):
+    """
+    close the sessions of the certificate and key, or all the sessions
+    """
+    with _sessions_lock:
+        for key in list(_sessions):
+            if certificate_file is None or key == (certificate_file, key_file):
+                _sessions.pop(key).close()
+
+
+class PooledHttpsTransport(HttpTransport):
+    """
+    suds transport sending the SOAP requests with the session of the certificate and key,
+    the WSDL files are still opened by the default transport
+    """
+
+    def __init__(self, certificate_file, key_file, **kwargs):
+        HttpTransport.__init__(self, **kwargs)
+        self.certificate_file = certificate_file
+        self.key_file = key_file
+
+    def send(self, request):
+        url = request.url
+        if isinstance(url, bytes):
+            url = url.decode()
+        message = request.message
+        if isinstance(message, str):
+            message = message.encode("utf-8")
+        session = get_session(self.certificate_file, self.key_file)
+        r = session.post(
+            url, data=message, headers=request.headers, timeout=self.options.timeout
+        )
+        if r.status_code in (202, 204):
+            return None
+        if r.status_code >= 300:
+            # suds reads the SOAP fault from the body
+            raise TransportError(r.reason, r.status_code, BytesIO(r.content))
+        return Reply(200, r.headers, r.content)
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+# default values of the PYSCADA_ENEDIS dictionary which can be set in the django settings
+DEFAULT_SETTINGS = {
+    # SGE proxy host, or URL of a server replacing the Enedis one like pyscada.enedis.mockserver
+    "proxy_url": "sge-b2b.enedis.fr",
+    # max number of SOAP clients kept per process
+    "client_cache_size": 32,
+    # max number of detailsV3 windows requested at the same time for a device
+    "detailsV3_concurrency": 1,
+    # the detailsV3 values read are written every flush_windows windows or flush_points points
+    "detailsV3_flush_windows": 10,
+    "detailsV3_flush_points": 100000,
+    # seconds between two reads of each kind of command service, the detailsV3 data is read
+    # at publication_hour (Europe/Paris) once published, after a jitter of up to schedule_jitter seconds
+    "service_intervals": {
+        "technical": 7 * 86400,
+        "COURBE": 86400,
+        "ENERGIE": 86400,
+        "INDEX": 86400,
+    },
+    "publication_hour": 8,
+    "schedule_jitter": 7200,
+    # failed requests are retried by later reads after an exponential delay (seconds)
+    "retry_max_attempts": 10,
+    "retry_base_delay": 60.0,
+    "retry_max_delay": 21600.0,
+    # min delay before retrying after a quota exceeded error (seconds)
+    "retry_quota_delay": 3600.0,
+    # requests rate by contract or login : {"default": {...}, "login or contract": {...}}
+    # with per_second, burst and per_day (None for no daily limit) keys
+    "rate_limits": {"default": {"per_second": 5.0, "burst": 5, "per_day": None}},
+    # folder of the rate limit state files shared by the processes, None to limit each process
+    "rate_limit_state_dir": None,
+    # seconds without other change of the devices before reinitializing the DAQ processes, 0 to reinit at once
+    "reinit_delay": 5.0,
+    # number of devices read by each process and number of threads reading them
+    "worker_shard_size": 100,
+    "worker_threads": 16,
+    # HTTPS connections kept open by certificate and key, and seconds before closing the idle ones
+    "https_pool_size": 10,
+    "https_idle_timeout": 50.0,
+    # folder of the detailsV3 responses cache, None to disable it
+    "response_cache_dir": None,
+    "response_cache_max_size": 512 * 1024 * 1024,
+    # [[window age in days, seconds], ...] the first age greater than the window age gives
+    # the seconds a response is kept, None as age for the older windows and as seconds to keep them
+    "response_cache_ttls": [[2, 0], [35, 86400], [None, None]],
+    # "record" to save the responses in replay_dir, "replay" to read them instead of sending the requests
+    "replay_mode": None,
+    "replay_dir": None,
+    # max number of detailsV3 values written to the recorded data by each insert
+    "bulk_batch_size": 5000,
+    # folder where each process writes its metrics for the node exporter textfile collector, None to disable
+    "metrics_dir": None,
+}
+
+
+def get_setting(name):
+    """
+    return the PYSCADA_ENEDIS setting or its default value
+    """
+    try:
+        enedis_settings = getattr(settings, "PYSCADA_ENEDIS", {})
+    except ImproperlyConfigured:
+        enedis_settings = {}
+    if name in enedis_settings:
+        return enedis_settings[name]
+    return DEFAULT_SETTINGS.get(name)
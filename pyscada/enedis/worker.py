@@ -3,8 +3,21 @@
 
 from __future__ import unicode_literals
 
-from pyscada.utils.scheduler import SingleDeviceDAQProcessWorker
+from pyscada.utils.scheduler import (
+    MultiDeviceDAQProcessWorker,
+    MultiDeviceDAQProcess,
+)
+from pyscada.models import Device, DeviceReadTask
 from pyscada.enedis import PROTOCOL_ID
+from pyscada.enedis.metrics import write_textfile
+from pyscada.enedis.technical import collect_technical
+from pyscada.enedis.utils import get_setting
+
+from django.db import connection
+from django.db.models import Q
+
+from concurrent.futures import ThreadPoolExecutor
+from time import time
 
 import logging
 
@@ -12,9 +25,137 @@ import logging
 logger = logging.getLogger(__name__)
 
 
-class Process(SingleDeviceDAQProcessWorker):
+def read_tasks_filter(device_ids):
+    """
+    return the filter of the read tasks of the devices, of their variables
+    and of their variable properties
+    """
+    return (
+        Q(device_id__in=device_ids)
+        | Q(variable__device_id__in=device_ids)
+        | Q(variable_property__variable__device_id__in=device_ids)
+    )
+
+
+class Process(MultiDeviceDAQProcessWorker):
+    """
+    start one process for each group of worker_shard_size SGE Tiers devices
+    """
+
     device_filter = dict(sgetiersdevice__isnull=False, protocol_id=PROTOCOL_ID)
     bp_label = "pyscada.sgetiers-%s"
+    process_class = "pyscada.enedis.worker.SGETiersDAQProcess"
 
     def __init__(self, dt=5, **kwargs):
-        super(SingleDeviceDAQProcessWorker, self).__init__(dt=dt, **kwargs)
+        super(MultiDeviceDAQProcessWorker, self).__init__(dt=dt, **kwargs)
+
+    def gen_group_id(self, item):
+        return "%d" % (item.pk // max(1, int(get_setting("worker_shard_size"))))
+
+
+class SGETiersDAQProcess(MultiDeviceDAQProcess):
+    """
+    read the devices of a shard using a pool of threads, the requests mostly wait for the network
+    """
+
+    def _run_threads(self, function, items):
+        """
+        call the function for each item using the threads pool, return the results in the items order
+        """
+        items = list(items)
+        if len(items) == 0:
+            return []
+        with ThreadPoolExecutor(
+            max_workers=max(1, min(int(get_setting("worker_threads")), len(items))),
+            thread_name_prefix=f"sgetiers-{self.process_id}",
+        ) as executor:
+            return list(executor.map(function, items))
+
+    def _init_device(self, item):
+        try:
+            if not item.active:
+                logger.info(
+                    f"Device {item.id} is not active. Not added to process {self.process_id}."
+                )
+                return item, None
+            return item, item.get_device_instance()
+        except:
+            logger.error(
+                f"Exception while initialisation of DAQ Process for Device {item.pk}",
+                exc_info=True,
+            )
+            return item, None
+        finally:
+            connection.close()
+
+    def init_process(self):
+        """
+        init the devices of the shard at the same time as each handler waits while created
+        """
+        self.devices = {}
+        self.dt_query_data = 3600.0
+        items = Device.objects.filter(protocol__daq_daemon=1, id__in=self.device_ids)
+        for item, tmp_device in self._run_threads(self._init_device, items):
+            if tmp_device is not None:
+                self.devices[item.pk] = tmp_device
+                self.dt_set = min(self.dt_set, item.polling_interval)
+                self.dt_query_data = min(self.dt_query_data, item.polling_interval)
+        if len(self.devices) == 0:
+            return False
+        return True
+
+    def _request_data(self, device_item):
+        device_id, device = device_item
+        try:
+            return device_id, device.request_data()
+        except:
+            logger.error(f"Exception while reading Device {device_id}", exc_info=True)
+            return device_id, None
+        finally:
+            connection.close()
+
+    def loop(self):
+        """
+        read the devices when the polling interval is elapsed or a read task is waiting,
+        the SGE Tiers devices cannot write
+        """
+        drts = DeviceReadTask.objects.filter(
+            Q(done=False, start__lte=time(), failed=False)
+            & read_tasks_filter(self.device_ids)
+        )
+        if time() - self.last_query <= self.dt_query_data and not drts.count():
+            return 1, None
+        self.last_query = time()
+
+        # request the technical data of the devices sharing a login together
+        collect_technical(
+            device._h
+            for device in self.devices.values()
+            if device.driver_ok and device.driver_handler_ok
+        )
+
+        data = [[]]
+        for device_id, tmp_data in self._run_threads(
+            self._request_data, self.devices.items()
+        ):
+            if isinstance(tmp_data, list):
+                # the detailsV3 values are written by the handler, the list can be empty
+                drts.filter(read_tasks_filter([device_id])).update(
+                    done=True, finished=time()
+                )
+                if len(tmp_data) == 0:
+                    continue
+                if len(data[-1]) + len(tmp_data) < 998:
+                    # add to the last write job
+                    data[-1] += tmp_data
+                else:
+                    # add to next write job
+                    data.append(tmp_data)
+            else:
+                drts.filter(read_tasks_filter([device_id])).update(
+                    failed=True, finished=time()
+                )
+        write_textfile(
+            f"pyscada_enedis_{self.process_id}", {"process": self.process_id}
+        )
+        return 1, data
@@ -36,6 +36,8 @@ setup(
         "python-slugify[unidecode]",
         "requests",
         "defusedxml",
+        "numpy",
+        "pytz",
     ],
     packages=find_namespace_packages(exclude=["project", "project.*"]),
     include_package_data=True,